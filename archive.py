@@ -0,0 +1,323 @@
+# archive.py - 按发布月份分区、写入时去重的 Parquet 归档
+import argparse
+import glob
+import os
+import re
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from dedupe_keys import FingerprintStore, fingerprints, item_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时归档不可用，调用方退回 CSV 备份
+    pa = None
+    pq = None
+
+# ARCHIVE_DIR 为空时同样使用默认目录（.env.example 中该项留空）
+DEFAULT_ARCHIVE_DIR = os.getenv('ARCHIVE_DIR') or os.path.join(
+    os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'archive'
+)
+
+# 每条记录的去重标识列（与跨网站去重规则一致：规范化的标题+发布时间）
+KEY_COLUMN = '_key'
+
+# 归档中全部记录去重标识的指纹文件
+FINGERPRINT_FILE = 'fingerprints.u64'
+
+# 无法识别发布月份的记录所在分区
+UNKNOWN_MONTH = 'unknown'
+
+_MONTH_PATTERN = re.compile(r'^(\d{4})[-/.年](\d{1,2})')
+
+
+def archive_available():
+    return pa is not None
+
+
+def open_archive(root=None):
+    """
+    打开默认归档；未安装 pyarrow 或 ARCHIVE_ENABLED=false 时返回 None
+
+    Returns:
+        ParquetArchive 或 None
+    """
+    if os.getenv('ARCHIVE_ENABLED', 'true').lower() != 'true':
+        return None
+    if not archive_available():
+        print("⚠️  未安装 pyarrow，无法使用 Parquet 归档，将使用 CSV 备份")
+        return None
+    return ParquetArchive(root)
+
+
+def publish_month(value):
+    """发布时间 -> 'YYYY-MM'，无法识别时返回 UNKNOWN_MONTH"""
+    match = _MONTH_PATTERN.match(str(value or '').strip())
+    if not match:
+        return UNKNOWN_MONTH
+    return f"{match.group(1)}-{int(match.group(2)):02d}"
+
+
+def row_key(row):
+    return item_key(row)
+
+
+class ParquetArchive:
+    """
+    只追加的列式归档，目录结构：
+
+        <root>/month=2025-01/part-<时间戳>-<随机串>.parquet
+
+    每次追加时按发布月份分组，只写入归档中尚不存在的记录（每批一个新文件）；
+    是否已归档通过 <root>/fingerprints.u64 中的 64 位指纹判断，内存占用不随归档规模增长。
+    compact 将分区内的多个文件合并为一个；read_range 只读取日期范围涉及的分区。
+    所有列以字符串保存，不同批次的列可以不同。
+    """
+
+    def __init__(self, root=None, compression='zstd'):
+        if not archive_available():
+            raise RuntimeError("Parquet 归档需要安装 pyarrow")
+        self.root = root or DEFAULT_ARCHIVE_DIR
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._fingerprints = None  # 首次追加时打开
+
+    # ---- 分区与文件 ----
+
+    def _partition_dir(self, month):
+        return os.path.join(self.root, f"month={month}")
+
+    def _part_files(self, month):
+        return sorted(glob.glob(os.path.join(self._partition_dir(month), '*.parquet')))
+
+    def months(self):
+        """已有的分区（按月份排序）"""
+        pattern = os.path.join(self.root, 'month=*')
+        return sorted(os.path.basename(path)[len('month='):] for path in glob.glob(pattern) if os.path.isdir(path))
+
+    def _fingerprint_store(self):
+        """打开指纹文件；不存在（旧版本归档）时由已有记录重建"""
+        if self._fingerprints is None:
+            path = os.path.join(self.root, FINGERPRINT_FILE)
+            rebuild = not os.path.exists(path)
+            self._fingerprints = FingerprintStore(path)
+            if rebuild and self.months():
+                self._fingerprints.rebuild(self._all_keys())
+        return self._fingerprints
+
+    def _all_keys(self):
+        """按当前规则重新计算归档中所有记录的去重标识（逐文件读取）"""
+        for month in self.months():
+            for path in self._part_files(month):
+                df = self._read_files([path], ['标题', '发布时间', '项目编号'])
+                for row in df.to_dict('records'):
+                    yield row_key(row)
+
+    def _write_part(self, month, df, suffix=''):
+        """写入一个分区文件（先写临时文件再改名，读取方不会看到写了一半的文件）"""
+        directory = self._partition_dir(month)
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}{suffix}.parquet"
+        path = os.path.join(directory, name)
+
+        table = pa.table({
+            str(column): pa.array([None if pd.isna(value) else str(value) for value in df[column]], type=pa.string())
+            for column in df.columns
+        })
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression=self.compression)
+        os.replace(tmp_path, path)
+        return path
+
+    # ---- 写入 ----
+
+    def append(self, rows):
+        """
+        追加记录，已归档过的记录（标题+发布时间相同）不会重复写入
+
+        Args:
+            rows: 记录列表或 DataFrame
+
+        Returns:
+            int: 实际写入的条数
+        """
+        df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        if df.empty:
+            return 0
+
+        df[KEY_COLUMN] = [row_key(row) for row in df.to_dict('records')]
+        df = df.drop_duplicates(subset=KEY_COLUMN)
+        if '发布时间' in df.columns:
+            months = df['发布时间'].map(publish_month)
+        else:
+            months = pd.Series(UNKNOWN_MONTH, index=df.index)
+
+        written = 0
+        with self._lock:
+            store = self._fingerprint_store()
+            df['_fingerprint'] = fingerprints(df[KEY_COLUMN])
+            df = df[~store.contains_many(df['_fingerprint'].to_numpy())]
+            try:
+                for month, group in df.groupby(months.loc[df.index], sort=True):
+                    self._write_part(month, group.drop(columns=['_fingerprint']))
+                    store.add_many(group['_fingerprint'].to_numpy())
+                    written += len(group)
+            finally:
+                # 中途失败时已写入分区的记录也落盘，下次不会重复写入
+                store.flush()
+        return written
+
+    # ---- 合并 ----
+
+    def compact(self, months=None):
+        """
+        将分区内的多个文件合并为一个（去重并按发布时间排序）
+
+        Returns:
+            dict: {分区: (合并前文件数, 合并后记录数)}
+        """
+        result = {}
+        with self._lock:
+            for month in months or self.months():
+                files = self._part_files(month)
+                if len(files) < 2:
+                    continue
+                df = self._read_files(files)
+                # 按当前规则重新计算标识（旧版本写入的标识随之迁移）
+                df[KEY_COLUMN] = [row_key(row) for row in df.to_dict('records')]
+                df = df.drop_duplicates(subset=KEY_COLUMN)
+                if '发布时间' in df.columns:
+                    df = df.sort_values('发布时间', kind='stable')
+                self._write_part(month, df, suffix='-compact')
+                # 只删除参与合并的文件，合并期间新追加的文件保留
+                for path in files:
+                    os.remove(path)
+                result[month] = (len(files), len(df))
+        return result
+
+    # ---- 读取 ----
+
+    @staticmethod
+    def _read_files(files, columns=None):
+        frames = []
+        for path in files:
+            if columns is None:
+                table = pq.read_table(path)
+            else:
+                available = set(pq.read_schema(path).names)
+                table = pq.read_table(path, columns=[column for column in columns if column in available])
+            frames.append(table.to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        return pd.concat(frames, ignore_index=True)
+
+    def read_range(self, start=None, end=None, columns=None, include_key=False):
+        """
+        读取发布时间在 [start, end] 内的记录（只读取涉及的月份分区）
+
+        Args:
+            start / end: 'YYYY-MM-DD' 字符串或 datetime，None 表示不限
+            columns: 只读取这些列（默认全部）
+            include_key: 是否保留去重标识列
+
+        Returns:
+            DataFrame
+        """
+        start = start.strftime('%Y-%m-%d') if hasattr(start, 'strftime') else start
+        end = end.strftime('%Y-%m-%d') if hasattr(end, 'strftime') else end
+
+        months = []
+        for month in self.months():
+            if month == UNKNOWN_MONTH:
+                if start is None and end is None:
+                    months.append(month)
+                continue
+            if (start is None or month >= start[:7]) and (end is None or month <= end[:7]):
+                months.append(month)
+
+        wanted = None
+        if columns is not None:
+            wanted = list(dict.fromkeys(list(columns) + [KEY_COLUMN, '发布时间']))
+        files = [path for month in months for path in self._part_files(month)]
+        df = self._read_files(files, wanted)
+        if df.empty:
+            return df
+
+        if '发布时间' in df.columns and (start or end):
+            day = df['发布时间'].fillna('').str.slice(0, 10)
+            mask = pd.Series(True, index=df.index)
+            if start:
+                mask &= day >= start
+            if end:
+                mask &= day <= end
+            df = df[mask]
+
+        # 合并过程中可能短暂存在重复文件，读取时再去重一次
+        df = df.drop_duplicates(subset=KEY_COLUMN).reset_index(drop=True)
+        if columns is not None:
+            df = df[[column for column in columns if column in df.columns] + ([KEY_COLUMN] if include_key else [])]
+        elif not include_key:
+            df = df.drop(columns=[KEY_COLUMN])
+        return df
+
+    def stats(self):
+        """各分区的文件数和记录数"""
+        result = {}
+        for month in self.months():
+            files = self._part_files(month)
+            rows = sum(pq.read_metadata(path).num_rows for path in files)
+            result[month] = (len(files), rows)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='晋能控股招标数据 - Parquet 归档')
+    parser.add_argument('--root', help='归档目录（默认 ARCHIVE_DIR 或 .crawler_cache/archive）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='导入已有的 CSV 备份文件')
+    import_parser.add_argument('files', nargs='+', help='CSV 文件')
+
+    compact_parser = subparsers.add_parser('compact', help='合并分区内的小文件')
+    compact_parser.add_argument('--month', action='append', help='只合并指定月份（YYYY-MM，可重复）')
+
+    read_parser = subparsers.add_parser('read', help='读取日期范围内的记录')
+    read_parser.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    read_parser.add_argument('--end', help='结束日期 YYYY-MM-DD')
+    read_parser.add_argument('--output', help='导出到 CSV 文件（默认打印前 20 条）')
+
+    subparsers.add_parser('stats', help='查看各分区的文件数和记录数')
+    args = parser.parse_args()
+
+    archive = ParquetArchive(args.root)
+
+    if args.command == 'import':
+        for path in args.files:
+            written = archive.append(pd.read_csv(path, dtype=str, encoding='utf-8-sig'))
+            print(f"📥 {path}: 新增 {written} 条")
+    elif args.command == 'compact':
+        result = archive.compact(args.month)
+        for month, (files, rows) in result.items():
+            print(f"🗜️  {month}: {files} 个文件合并为 1 个，共 {rows} 条")
+        if not result:
+            print("没有需要合并的分区")
+    elif args.command == 'read':
+        started = time.perf_counter()
+        df = archive.read_range(args.start, args.end)
+        print(f"📖 读取 {len(df)} 条记录，耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+        if args.output:
+            df.to_csv(args.output, index=False, encoding='utf-8-sig')
+            print(f"📁 已导出至: {args.output}")
+        else:
+            print(df.head(20).to_string())
+    elif args.command == 'stats':
+        for month, (files, rows) in archive.stats().items():
+            print(f"   {month}: {files} 个文件，{rows} 条")
+
+
+if __name__ == "__main__":
+    main()
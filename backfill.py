@@ -0,0 +1,272 @@
+# backfill.py - 长时间范围的分片回填（可断点续跑）
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# 将当前目录加入路径，确保能导入自定义模块
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from spider_core import JnkgBiddingSpider
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'backfill')
+
+
+def split_date_range(start_date, end_date, shard_days=7):
+    """
+    将日期区间拆分为按天/按周的分片（首尾均包含）
+
+    Returns:
+        list: [(分片开始, 分片结束), ...]，按时间从新到旧排列
+    """
+    shards = []
+    shard_start = datetime.combine(start_date.date(), datetime.min.time())
+    last_day = datetime.combine(end_date.date(), datetime.min.time())
+    while shard_start <= last_day:
+        shard_end = min(shard_start + timedelta(days=shard_days - 1), last_day)
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    # 先回填最近的数据
+    return list(reversed(shards))
+
+
+def shard_id(shard):
+    return f"{shard[0].strftime('%Y-%m-%d')}_{shard[1].strftime('%Y-%m-%d')}"
+
+
+class BackfillCheckpoint:
+    """
+    记录回填的日期区间和已完成的分片，被中断的回填重新运行时沿用原区间并跳过已完成的分片
+    """
+
+    def __init__(self, job_id, root=None):
+        self.path = os.path.join(root or DEFAULT_CHECKPOINT_DIR, f"{job_id}.json")
+        self._lock = threading.Lock()
+        self.completed = set()
+        self.start = None
+        self.end = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.completed = set(data.get('completed', []))
+                self.start = data.get('start')
+                self.end = data.get('end')
+            except (OSError, ValueError) as e:
+                print(f"⚠️  读取回填检查点失败，将从头开始: {e}")
+
+    def resolve_range(self, start_date, end_date, shard_days):
+        """
+        确定本次回填的日期区间
+
+        检查点中保存的区间还有未完成的分片时沿用该区间（续跑），
+        否则保存本次区间；与保存的区间相同时保留已完成的分片。
+
+        Returns:
+            tuple: (开始时间, 结束时间)
+        """
+        start, end = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        with self._lock:
+            if (self.start, self.end) == (start, end):
+                return start_date, end_date
+            if self.start and self.end:
+                stored = (datetime.strptime(self.start, '%Y-%m-%d'), datetime.strptime(self.end, '%Y-%m-%d'))
+                if any(shard_id(shard) not in self.completed for shard in split_date_range(*stored, shard_days)):
+                    print(f"⏯️  继续上次未完成的回填区间: {self.start} ~ {self.end}")
+                    return stored
+            self.start, self.end = start, end
+            self.completed = set()
+            self._save()
+        return start_date, end_date
+
+    def is_done(self, shard):
+        return shard_id(shard) in self.completed
+
+    def mark_done(self, shard):
+        with self._lock:
+            self.completed.add(shard_id(shard))
+            self._save()
+
+    def _save(self):
+        """在锁内调用"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'start': self.start, 'end': self.end, 'completed': sorted(self.completed)},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def make_job_id(spider, shard_days, start=None, end=None, days=None):
+    """
+    同一组 (网站、关键词、查询模式、日期参数、分片大小) 对应同一个检查点
+
+    只使用调用方给定的日期参数（YYYY-MM-DD 字符串）：未指定结束日期时结束日期随运行日期变化，
+    不参与 job id，实际区间保存在检查点中，续跑时沿用（见 BackfillCheckpoint.resolve_range）。
+    """
+    job = {
+        'sites': [(c['name'], c['site_id'], c['category_id']) for c in spider.website_configs],
+        'keywords': spider.keywords,
+        'mode': spider.search_mode,
+        'start': start,
+        'end': end,
+        'days': None if start else days,
+        'shard_days': shard_days,
+    }
+    digest = hashlib.md5(json.dumps(job, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{start or f'{days}d'}_{end or 'latest'}_{digest[:8]}"
+
+
+def run_backfill(spider, start_date, end_date, shard_days=7, shard_workers=2, sink=None, checkpoint=None):
+    """
+    分片并发回填
+
+    每个分片完成后立即经过跨网站去重交给 sink 处理（例如上传飞书），
+    sink 成功返回后分片才写入检查点；失败的分片在下次运行时重试。
+
+    Args:
+        checkpoint: 回填检查点（默认按 start_date、end_date 确定）；
+                    其中保存的区间未完成时沿用该区间，而不是 start_date、end_date
+
+    Returns:
+        dict: 回填统计
+    """
+    if checkpoint is None:
+        checkpoint = BackfillCheckpoint(make_job_id(
+            spider, shard_days, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        ))
+    start_date, end_date = checkpoint.resolve_range(start_date, end_date, shard_days)
+    shards = split_date_range(start_date, end_date, shard_days)
+    pending = [shard for shard in shards if not checkpoint.is_done(shard)]
+
+    print(f"🗂️  回填区间: {start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}")
+    print(f"   分片: {len(shards)} 个（每片 {shard_days} 天），已完成 {len(shards) - len(pending)} 个")
+    print(f"   检查点: {checkpoint.path}")
+
+    stats = {'shards': len(shards), 'done': len(shards) - len(pending), 'failed': 0, 'rows': 0}
+    seen = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, shard_workers)) as executor:
+        futures = {
+            executor.submit(spider._crawl_websites, spider.website_configs,
+                            date_range=shard, raise_errors=True): shard
+            for shard in pending
+        }
+        # 分片完成一个处理一个，数据边抓边落地
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                _, unique_rows = spider._merge_website_results(future.result(), seen)
+                if unique_rows and sink:
+                    sink(unique_rows)
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"❌ 分片 {shard_id(shard)} 失败，下次运行时重试: {e}")
+                continue
+
+            checkpoint.mark_done(shard)
+            stats['done'] += 1
+            stats['rows'] += len(unique_rows)
+            print(f"✅ 分片 {shard_id(shard)} 完成: {len(unique_rows)} 条 "
+                  f"（进度 {stats['done']}/{stats['shards']}）")
+
+    return stats
+
+
+def make_feishu_sink(feishu_config):
+    """上传到飞书多维表格的 sink；有失败记录时抛出异常，使分片保持未完成"""
+    from feishu_writer import FeishuBitableWriter
+
+    writer = FeishuBitableWriter(
+        app_id=feishu_config['app_id'],
+        app_secret=feishu_config['app_secret'],
+        app_token=feishu_config['app_token'],
+        table_id=feishu_config['table_id'],
+    )
+    lock = threading.Lock()
+
+    def sink(rows):
+        with lock:
+            success, fail, duplicate = writer.add_records(pd.DataFrame(rows), unique_key_field='项目编号')
+        print(f"   上传: 成功 {success} 条，重复 {duplicate} 条，失败 {fail} 条")
+        if fail:
+            raise RuntimeError(f"{fail} 条记录上传失败")
+
+    return sink
+
+
+def make_csv_sink(csv_file):
+    """追加写入本地CSV的 sink"""
+    lock = threading.Lock()
+
+    def sink(rows):
+        with lock:
+            write_header = not os.path.exists(csv_file)
+            pd.DataFrame(rows).to_csv(csv_file, mode='a', header=write_header, index=False, encoding='utf-8-sig')
+
+    return sink
+
+
+def make_archive_sink(archive):
+    """追加到 Parquet 归档的 sink（写入时按 标题+发布时间 去重）"""
+
+    def sink(rows):
+        written = archive.append(rows)
+        print(f"   归档: 新增 {written} 条")
+
+    return sink
+
+
+def main():
+    parser = argparse.ArgumentParser(description='晋能控股招标数据 - 历史回填')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', help='结束日期 YYYY-MM-DD（默认今天）')
+    parser.add_argument('--days', type=int, default=365, help='未指定 --start 时回填最近多少天')
+    parser.add_argument('--shard-days', type=int, default=7, help='每个分片的天数')
+    parser.add_argument('--workers', type=int, default=2, help='并发分片数')
+    parser.add_argument('--keywords', help='覆盖搜索关键词（逗号分隔）')
+    args = parser.parse_args()
+
+    end_date = datetime.strptime(args.end, '%Y-%m-%d') if args.end else datetime.now()
+    if args.start:
+        start_date = datetime.strptime(args.start, '%Y-%m-%d')
+    else:
+        start_date = end_date - timedelta(days=args.days)
+
+    spider = JnkgBiddingSpider()
+    if args.keywords:
+        spider.keywords = [k.strip() for k in args.keywords.split(',') if k.strip()]
+
+    # job id 只取命令行给定的参数，--days 回填隔天重跑时仍能找到检查点并沿用原区间
+    checkpoint = BackfillCheckpoint(make_job_id(spider, args.shard_days, args.start, args.end, args.days))
+    start_date, end_date = checkpoint.resolve_range(start_date, end_date, args.shard_days)
+
+    from main import get_feishu_config
+    feishu_config = get_feishu_config()
+    if feishu_config:
+        sink = make_feishu_sink(feishu_config)
+    else:
+        from archive import open_archive
+        archive = open_archive()
+        if archive:
+            print(f"由于飞书配置不全，回填数据将追加到归档: {archive.root}")
+            sink = make_archive_sink(archive)
+        else:
+            csv_file = f"回填_晋能控股招标_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"
+            print(f"由于飞书配置不全，回填数据将追加保存至: {csv_file}")
+            sink = make_csv_sink(csv_file)
+
+    stats = run_backfill(spider, start_date, end_date, args.shard_days, args.workers, sink, checkpoint)
+
+    print(f"\n📊 回填结束: 完成分片 {stats['done']}/{stats['shards']}，"
+          f"失败 {stats['failed']} 个，本次写入 {stats['rows']} 条")
+
+
+if __name__ == "__main__":
+    main()
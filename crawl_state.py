@@ -0,0 +1,104 @@
+# crawl_state.py - 增量爬取的高水位标记
+import json
+import os
+import threading
+
+from dedupe_keys import item_key
+
+DEFAULT_STATE_FILE = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'crawl_state.json')
+
+
+def normalize_publish_date(value):
+    """统一发布时间格式，便于按字符串比较先后（2026-01-01T08:00:00 -> 2026-01-01 08:00:00）"""
+    return str(value or '').replace('T', ' ').strip()
+
+
+def item_identity(item):
+    """记录的唯一标识：优先使用接口返回的 id，其次是链接，最后是标题+发布时间"""
+    for field in ('id', 'contentId', 'url'):
+        if item.get(field):
+            return str(item[field])
+    return item_key(item)
+
+
+class CrawlState:
+    """
+    按 (site_id, category_id, 搜索字段, 关键词) 记录高水位：
+    已见过的最新 publishDate，以及该时间点上已见过的记录标识。
+
+    爬取过程中的更新先暂存，调用 commit() 后才写入磁盘，
+    这样上传失败时下一次运行仍会重新抓取这些记录。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_STATE_FILE
+        self._marks = self._load()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  读取爬取状态失败，将执行全量爬取: {e}")
+            return {}
+
+    @staticmethod
+    def make_key(site_id, category_id, search_field, keyword):
+        return f"{site_id}:{category_id}:{search_field or '*'}:{keyword or '*'}"
+
+    def get(self, key):
+        """获取已提交的高水位标记，没有则返回 None"""
+        with self._lock:
+            return self._marks.get(key)
+
+    @staticmethod
+    def is_known(mark, item):
+        """判断记录是否已在上次爬取中见过"""
+        if not mark:
+            return False
+        publish_date = normalize_publish_date(item.get('publishDate'))
+        if publish_date < mark['publishDate']:
+            return True
+        return publish_date == mark['publishDate'] and item_identity(item) in mark['ids']
+
+    def advance(self, key, rows):
+        """根据本次抓取到的记录推进高水位（暂存，commit 后生效）"""
+        if not rows:
+            return
+
+        with self._lock:
+            mark = self._pending.get(key) or self._marks.get(key) or {'publishDate': '', 'ids': []}
+            newest = mark['publishDate']
+            ids = set(mark['ids'])
+
+            for item in rows:
+                publish_date = normalize_publish_date(item.get('publishDate'))
+                if publish_date > newest:
+                    newest = publish_date
+                    ids = set()
+                if publish_date == newest:
+                    ids.add(item_identity(item))
+
+            self._pending[key] = {'publishDate': newest, 'ids': sorted(ids)}
+
+    def commit(self):
+        """将暂存的高水位写入磁盘"""
+        with self._lock:
+            if not self._pending:
+                return
+            self._marks.update(self._pending)
+            self._pending = {}
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._marks, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+        print(f"💾 爬取状态已保存: {self.path}")
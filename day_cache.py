@@ -0,0 +1,91 @@
+# day_cache.py - 按自然日分片的查询结果缓存
+import json
+import os
+import re
+from datetime import date, timedelta
+
+DEFAULT_CACHE_DIR = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'days')
+
+
+def row_day(item):
+    """记录所属的自然日（YYYY-MM-DD）"""
+    return str(item.get('publishDate') or '')[:10]
+
+
+class DayCache:
+    """
+    查询结果按 (siteId, categoryId, 查询字段, 关键词, 自然日) 分片保存在本地。
+
+    已经结束的日期（默认早于昨天）内容不再变化，分片永久有效；
+    今天和昨天仍可能有新公告，每次都重新请求，不写入缓存。
+    """
+
+    def __init__(self, root=None, open_days=2):
+        self.root = root or DEFAULT_CACHE_DIR
+        self.open_days = open_days
+
+    @staticmethod
+    def make_query_key(site_id, category_id, search_field, keyword):
+        key = f"{site_id}_{category_id}_{search_field or 'all'}_{keyword or 'all'}"
+        # 去掉文件名中不允许的字符
+        return re.sub(r'[\\/:*?"<>|\s]', '_', key)
+
+    def is_closed(self, day):
+        """日期是否已结束（不会再有新数据）"""
+        return day <= date.today() - timedelta(days=self.open_days)
+
+    def _shard_path(self, query_key, day):
+        return os.path.join(self.root, query_key, f"{day.isoformat()}.json")
+
+    def load(self, query_key, day):
+        """读取某天的缓存分片，不存在或日期未结束时返回 None"""
+        if not self.is_closed(day):
+            return None
+        path = self._shard_path(query_key, day)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, query_key, day, rows):
+        """写入某天的分片（只保存已结束的日期）"""
+        if not self.is_closed(day):
+            return
+        path = self._shard_path(query_key, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def plan(self, query_key, start_day, end_day):
+        """
+        将日期窗口拆分为缓存命中部分和需要请求的连续区间
+
+        Returns:
+            tuple: ({日期: 缓存记录}, [(区间开始日, 区间结束日), ...])
+        """
+        cached = {}
+        missing_ranges = []
+        range_start = None
+
+        day = start_day
+        while day <= end_day:
+            rows = self.load(query_key, day)
+            if rows is None:
+                if range_start is None:
+                    range_start = day
+            else:
+                cached[day] = rows
+                if range_start is not None:
+                    missing_ranges.append((range_start, day - timedelta(days=1)))
+                    range_start = None
+            day += timedelta(days=1)
+
+        if range_start is not None:
+            missing_ranges.append((range_start, end_day))
+
+        return cached, missing_ranges
@@ -0,0 +1,175 @@
+# dedupe_index.py - 本地持久化去重索引（SQLite）
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_INDEX_FILE = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'dedupe_index.sqlite3')
+
+# SQLite 单条语句的参数个数有上限，批量查询时分块
+_CHUNK_SIZE = 500
+
+
+class DedupeIndex:
+    """
+    唯一标识 -> (record_id, 内容哈希) 的本地索引，按 (app_token, table_id) 区分命名空间。
+
+    每次 batch_create 成功后写入新记录；首次使用时与远端表格全量对账，
+    之后每隔同步周期按同步游标（远端最大修改时间）增量同步，
+    每隔对账周期再全量对账一次（清除远端已删除的记录），
+    平时去重只需查询本批数据的标识。
+    """
+
+    def __init__(self, namespace, path=None, sync_hours=24, reconcile_hours=168):
+        self.namespace = namespace
+        self.path = path or DEFAULT_INDEX_FILE
+        self.sync_seconds = sync_hours * 3600
+        self.reconcile_seconds = reconcile_hours * 3600
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 多个表格的索引共用同一个文件，并发写入时等待对方释放锁
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS record_keys ("
+                " namespace TEXT NOT NULL,"
+                " unique_key TEXT NOT NULL,"
+                " record_id TEXT,"
+                " content_hash TEXT,"
+                " PRIMARY KEY (namespace, unique_key))"
+            )
+            # 旧版本索引文件没有 content_hash 列
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(record_keys)")}
+            if 'content_hash' not in columns:
+                self._conn.execute("ALTER TABLE record_keys ADD COLUMN content_hash TEXT")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS index_meta ("
+                " namespace TEXT PRIMARY KEY,"
+                " reconciled_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                " namespace TEXT PRIMARY KEY,"
+                " synced_at REAL NOT NULL,"
+                " sync_cursor INTEGER)"
+            )
+
+    def lookup(self, keys):
+        """返回 keys 中已存在于索引的标识集合"""
+        keys = list({key for key in keys if key})
+        found = set()
+        with self._lock:
+            for i in range(0, len(keys), _CHUNK_SIZE):
+                chunk = keys[i:i + _CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT unique_key FROM record_keys WHERE namespace = ? AND unique_key IN ({placeholders})",
+                    [self.namespace] + chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def get_records(self, keys):
+        """返回 {唯一标识: (record_id, 内容哈希)}，只包含索引中存在的标识"""
+        keys = list({key for key in keys if key})
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _CHUNK_SIZE):
+                chunk = keys[i:i + _CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT unique_key, record_id, content_hash FROM record_keys"
+                    f" WHERE namespace = ? AND unique_key IN ({placeholders})",
+                    [self.namespace] + chunk
+                )
+                found.update((row[0], (row[1], row[2])) for row in rows)
+        return found
+
+    def _rows(self, items):
+        """(唯一标识, record_id[, 内容哈希]) -> 数据库行"""
+        rows = []
+        for item in items:
+            key, record_id, content_hash = (tuple(item) + (None,))[:3]
+            if key:
+                rows.append((self.namespace, key, record_id, content_hash))
+        return rows
+
+    def add_many(self, items):
+        """写入 [(唯一标识, record_id), ...] 或 [(唯一标识, record_id, 内容哈希), ...]"""
+        rows = self._rows(items)
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO record_keys (namespace, unique_key, record_id, content_hash)"
+                " VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def replace_all(self, mapping, hashes=None):
+        """用远端表格的 {唯一标识: record_id}（及 {唯一标识: 内容哈希}）全量替换本命名空间的索引"""
+        hashes = hashes or {}
+        rows = self._rows((key, record_id, hashes.get(key)) for key, record_id in mapping.items())
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM record_keys WHERE namespace = ?", (self.namespace,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO record_keys (namespace, unique_key, record_id, content_hash)"
+                " VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO index_meta (namespace, reconciled_at) VALUES (?, ?)",
+                (self.namespace, time.time())
+            )
+
+    def needs_reconcile(self):
+        """是否需要与远端全量对账（从未对账，或距上次对账已超过对账周期；周期为 0 时不定期对账）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reconciled_at FROM index_meta WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        if row is None:
+            return True
+        return self.reconcile_seconds > 0 and time.time() - row[0] >= self.reconcile_seconds
+
+    def needs_sync(self):
+        """是否需要与远端同步（从未全量对账，或距上次同步已超过同步周期）"""
+        if self.needs_reconcile():
+            return True
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM sync_state WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return row is None or time.time() - row[0] >= self.sync_seconds
+
+    def get_sync_cursor(self):
+        """上次同步时远端记录的最大修改时间（毫秒），需要全量对账时返回 None"""
+        if self.needs_reconcile():
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_cursor FROM sync_state WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark_synced(self, cursor):
+        """记录同步时间和同步游标"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (namespace, synced_at, sync_cursor) VALUES (?, ?, ?)",
+                (self.namespace, time.time(), cursor)
+            )
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM record_keys WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
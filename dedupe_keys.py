@@ -0,0 +1,274 @@
+# dedupe_keys.py - 统一的去重标识与持久化指纹集合
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from file_lock import FileLock
+
+DEFAULT_FINGERPRINT_FILE = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'fingerprints.u64')
+
+# 去重标识规则的版本，规则变化后按标识建立的索引需要重建
+KEY_VERSION = 2
+
+_SPACE_PATTERN = re.compile(r'\s+')
+_DATE_PATTERN = re.compile(r'^(\d{4})\D{1,3}(\d{1,2})\D{1,3}(\d{1,2})')
+
+# NFKC 之外再统一的常见中文标点
+_PUNCTUATION = str.maketrans({
+    '【': '[', '】': ']', '〔': '[', '〕': ']',
+    '“': '"', '”': '"', '‘': "'", '’': "'",
+    '—': '-', '－': '-', '　': ' ',
+})
+
+_FINGERPRINT_DTYPE = np.dtype('<u8')
+
+# 重建布隆过滤器、合并文件时每次处理的指纹数，内存占用与总数无关
+_CHUNK_SIZE = 1 << 20
+
+
+def _is_missing(value):
+    return value is None or (not isinstance(value, (list, dict, tuple)) and pd.isna(value))
+
+
+def normalize_text(value):
+    """全角转半角、统一中文括号引号、去掉所有空白并转小写"""
+    if _is_missing(value):
+        return ''
+    text = unicodedata.normalize('NFKC', str(value)).translate(_PUNCTUATION)
+    return _SPACE_PATTERN.sub('', text).lower()
+
+
+def normalize_date(value):
+    """发布时间统一为 YYYY-MM-DD（2025-1-3T08:00:00、2025/01/03、2025年1月3日 均可）"""
+    text = normalize_text(value)
+    match = _DATE_PATTERN.match(text)
+    if not match:
+        return text
+    year, month, day = match.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def dedupe_key(title, publish_date, project_code=''):
+    """
+    公告的去重标识：规范化后的 标题_发布日期，标题或日期缺失时使用项目编号
+
+    爬虫各阶段、飞书写入器、归档都使用这一规则，只有空白、全角标点或
+    时间部分不同的同一公告得到相同的标识。
+    """
+    title = normalize_text(title)
+    publish_date = normalize_date(publish_date)
+    if title and publish_date:
+        return f"{title}_{publish_date}"
+    return normalize_text(project_code)
+
+
+def _first(item, names):
+    for name in names:
+        value = item.get(name)
+        if not _is_missing(value) and str(value) != '':
+            return value
+    return ''
+
+
+def item_key(item, with_site=False):
+    """
+    记录的去重标识，同时支持接口原始数据（title/publishDate/mainCode）
+    和提取后的记录（项目名称或标题/发布时间/项目编号）
+
+    Args:
+        with_site: 标识中包含来源网站（各网站分别保留一份时使用）
+    """
+    key = dedupe_key(
+        _first(item, ('项目名称', '标题', 'title')),
+        _first(item, ('发布时间', 'publishDate')),
+        _first(item, ('项目编号', 'mainCode')),
+    )
+    if with_site:
+        key = f"{key}_{normalize_text(item.get('来源网站'))}"
+    return key
+
+
+def fingerprint(key):
+    """去重标识 -> 64 位指纹"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def fingerprints(keys):
+    """批量计算指纹，返回 uint64 数组"""
+    return np.fromiter((fingerprint(key) for key in keys), dtype=np.uint64)
+
+
+class BloomFilter:
+    """
+    位数组布隆过滤器。指纹本身已是均匀的 64 位哈希，
+    k 个位置由指纹的高低 32 位双重哈希得到，不再额外计算哈希。
+    """
+
+    def __init__(self, capacity, bits_per_key=10):
+        self.capacity = max(int(capacity), 1024)
+        self.size = self.capacity * bits_per_key
+        self.hash_count = max(1, round(bits_per_key * 0.69))
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, values):
+        values = np.asarray(values, dtype=np.uint64)
+        low = values & np.uint64(0xFFFFFFFF)
+        high = (values >> np.uint64(32)) | np.uint64(1)
+        size = np.uint64(self.size)
+        return [(low + np.uint64(i) * high) % size for i in range(self.hash_count)]
+
+    def add(self, values):
+        for positions in self._positions(values):
+            np.bitwise_or.at(
+                self._bits, positions >> np.uint64(3),
+                np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+            )
+
+    def might_contain(self, values):
+        result = np.ones(len(values), dtype=bool)
+        for positions in self._positions(values):
+            bits = self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)
+            result &= (bits & 1).astype(bool)
+        return result
+
+
+class FingerprintStore:
+    """
+    持久化的 64 位指纹集合，用于在数百万条历史公告中判断是否见过。
+
+    已落盘的指纹以升序 uint64 数组保存在文件中，通过内存映射按需读取，
+    查询为二分查找；新增的指纹先放在内存中，flush() 时与文件合并。
+    可选的布隆过滤器（每个指纹约 10 位）挡掉绝大多数未见过的查询，不必触及文件。
+    """
+
+    def __init__(self, path=None, bloom=True):
+        self.path = path or DEFAULT_FINGERPRINT_FILE
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.use_bloom = bloom
+        self._bloom = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """映射指纹文件并重建布隆过滤器"""
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= _FINGERPRINT_DTYPE.itemsize:
+            self._sorted = np.memmap(self.path, dtype=_FINGERPRINT_DTYPE, mode='r')
+        else:
+            self._sorted = np.zeros(0, dtype=_FINGERPRINT_DTYPE)
+
+        if self.use_bloom:
+            self._bloom = BloomFilter(len(self._sorted) * 2)
+            for i in range(0, len(self._sorted), _CHUNK_SIZE):
+                self._bloom.add(self._sorted[i:i + _CHUNK_SIZE])
+
+    def __len__(self):
+        return len(self._sorted) + len(self._pending)
+
+    def contains_many(self, values):
+        """
+        Args:
+            values: 指纹数组（见 fingerprints）
+
+        Returns:
+            ndarray: 与 values 对应的布尔数组
+        """
+        values = np.asarray(values, dtype=np.uint64)
+        with self._lock:
+            candidates = self._bloom.might_contain(values) if self._bloom else np.ones(len(values), dtype=bool)
+            found = np.zeros(len(values), dtype=bool)
+            if len(self._sorted) and candidates.any():
+                lookup = values[candidates]
+                positions = np.minimum(np.searchsorted(self._sorted, lookup), len(self._sorted) - 1)
+                found[candidates] = np.asarray(self._sorted[positions]) == lookup
+            if self._pending:
+                found |= np.fromiter((int(value) in self._pending for value in values), dtype=bool, count=len(values))
+        return found
+
+    def contains_keys(self, keys):
+        """按去重标识判断是否见过"""
+        return self.contains_many(fingerprints(keys))
+
+    def add_many(self, values):
+        """加入指纹（flush 后才写入文件）"""
+        values = np.asarray(values, dtype=np.uint64)
+        with self._lock:
+            self._pending.update(int(value) for value in values)
+            if self._bloom:
+                if len(self) > self._bloom.capacity:
+                    # 超出容量后误判率上升，扩容重建
+                    self._bloom = BloomFilter(len(self) * 2)
+                    for i in range(0, len(self._sorted), _CHUNK_SIZE):
+                        self._bloom.add(self._sorted[i:i + _CHUNK_SIZE])
+                    self._bloom.add(np.fromiter(self._pending, dtype=np.uint64, count=len(self._pending)))
+                else:
+                    self._bloom.add(values)
+
+    def add_keys(self, keys):
+        self.add_many(fingerprints(keys))
+
+    def flush(self):
+        """
+        将新增指纹与文件合并（加文件锁，合并时重新读取文件，
+        其他进程在此期间写入的指纹不会丢失）
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            pending = np.sort(np.fromiter(self._pending, dtype=np.uint64, count=len(self._pending)))
+
+            with FileLock(f"{self.path}.lock"):
+                if os.path.exists(self.path):
+                    current = np.memmap(self.path, dtype=_FINGERPRINT_DTYPE, mode='r') \
+                        if os.path.getsize(self.path) >= _FINGERPRINT_DTYPE.itemsize else np.zeros(0, _FINGERPRINT_DTYPE)
+                else:
+                    current = np.zeros(0, dtype=_FINGERPRINT_DTYPE)
+
+                tmp_path = f"{self.path}.tmp"
+                self._merge_to_file(current, pending, tmp_path)
+                del current
+                self._sorted = None
+                os.replace(tmp_path, self.path)
+
+            self._pending = set()
+            self._load()
+
+    @staticmethod
+    def _merge_to_file(current, pending, path):
+        """两个升序数组归并去重后写入文件，按块处理已有指纹"""
+        with open(path, 'wb') as f:
+            start = 0
+            last = None
+            for i in range(0, len(current), _CHUNK_SIZE):
+                chunk = np.asarray(current[i:i + _CHUNK_SIZE])
+                # 本块范围内（含之前遗留）的新增指纹
+                end = np.searchsorted(pending, chunk[-1], side='right') if i + _CHUNK_SIZE < len(current) else len(pending)
+                merged = np.union1d(chunk, pending[start:end])
+                start = end
+                if last is not None and len(merged) and merged[0] == last:
+                    merged = merged[1:]
+                if len(merged):
+                    last = merged[-1]
+                    merged.astype(_FINGERPRINT_DTYPE).tofile(f)
+            if not len(current):
+                np.unique(pending).astype(_FINGERPRINT_DTYPE).tofile(f)
+
+    def rebuild(self, keys):
+        """用给定的去重标识全量替换指纹集合"""
+        with self._lock:
+            values = np.unique(fingerprints(keys)).astype(_FINGERPRINT_DTYPE)
+            with FileLock(f"{self.path}.lock"):
+                tmp_path = f"{self.path}.tmp"
+                values.tofile(tmp_path)
+                self._sorted = None
+                os.replace(tmp_path, self.path)
+            self._pending = set()
+            self._load()
@@ -0,0 +1,178 @@
+# excel_export.py - 单次遍历、内存占用恒定的 Excel + CSV 导出
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from openpyxl import Workbook
+
+# Excel 工作表名最多 31 个字符
+_SHEET_NAME_LENGTH = 31
+
+
+def _cell_value(value):
+    """写入单元格的值：缺失值留空，列表/字典等转为文本"""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class StreamingExport:
+    """
+    边遍历边导出：每条记录只处理一次，同时写入
+
+        所有数据    全部记录
+        <来源网站>  按来源网站分表（首次出现该网站时创建）
+        统计        各网站数据量（关闭时写入，计数在遍历中累计）
+        CSV         与"所有数据"相同的内容
+
+    Excel 使用 openpyxl 的 write_only 模式，已写入的行不在内存中保留单元格对象；
+    Excel 写入失败时继续只写 CSV。列以第一条记录（或传入的 columns）为准。
+    文件在写入第一条记录时才创建，没有记录时不生成任何文件。
+    """
+
+    def __init__(self, filename, columns=None, group_field='来源网站'):
+        """
+        Args:
+            filename: 文件名（不含扩展名），生成 filename.xlsx 和 filename.csv
+            columns: 列顺序（默认取第一条记录的字段）
+            group_field: 分表依据的字段
+        """
+        self.excel_file = f"{filename}.xlsx"
+        self.csv_file = f"{filename}.csv"
+        self.columns = list(columns) if columns else None
+        self.group_field = group_field
+
+        self.total = 0
+        self.group_counts = {}
+        self.min_date = None
+        self.max_date = None
+        self.excel_error = None
+
+        self._workbook = Workbook(write_only=True)
+        self._all_sheet = self._workbook.create_sheet('所有数据')
+        self._group_sheets = {}
+        self._csv_handle = None
+        self._csv_writer = None
+        self._closed = False
+        self._extra_columns = set()
+
+    def _start(self, row):
+        if self.columns is None:
+            self.columns = list(row.keys())
+        self._csv_handle = open(self.csv_file, 'w', newline='', encoding='utf-8-sig')
+        self._csv_writer = csv.writer(self._csv_handle)
+        self._csv_writer.writerow(self.columns)
+        self._excel(lambda: self._all_sheet.append(self.columns))
+
+    def _excel(self, action):
+        """执行一次 Excel 写入；失败后不再写 Excel"""
+        if self._workbook is None:
+            return
+        try:
+            action()
+        except Exception as e:
+            self.excel_error = e
+            self._workbook = None
+            print(f"保存Excel失败: {e}，继续只保存CSV")
+
+    def _group_sheet(self, group):
+        sheet = self._group_sheets.get(group)
+        if sheet is None:
+            sheet = self._workbook.create_sheet(str(group)[:_SHEET_NAME_LENGTH])
+            sheet.append(self.columns)
+            self._group_sheets[group] = sheet
+        return sheet
+
+    def write(self, row):
+        """写入一条记录（字典）"""
+        if self._csv_writer is None:
+            self._start(row)
+        extra = row.keys() - self.columns
+        if extra - self._extra_columns:
+            self._extra_columns.update(extra)
+            print(f"⚠️  以下字段不在导出列中，已忽略: {', '.join(map(str, sorted(extra)))}")
+
+        values = [_cell_value(row.get(column)) for column in self.columns]
+        self._csv_writer.writerow(['' if value is None else value for value in values])
+
+        group = row.get(self.group_field)
+        if self._workbook is not None:
+            def append():
+                self._all_sheet.append(values)
+                if group is not None:
+                    self._group_sheet(group).append(values)
+            self._excel(append)
+
+        self.total += 1
+        if group is not None:
+            self.group_counts[group] = self.group_counts.get(group, 0) + 1
+        publish_date = row.get('发布时间')
+        if isinstance(publish_date, str) and publish_date:
+            if self.min_date is None or publish_date < self.min_date:
+                self.min_date = publish_date
+            if self.max_date is None or publish_date > self.max_date:
+                self.max_date = publish_date
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def close(self):
+        """写入统计表并保存文件（没有记录时不保存）"""
+        if self._closed:
+            return self.summary()
+        self._closed = True
+        if self._csv_handle is None:
+            self._workbook = None
+            return self.summary()
+        self._csv_handle.close()
+
+        def finish():
+            stats_sheet = self._workbook.create_sheet('统计')
+            stats_sheet.append(['网站', '数据量'])
+            for group, count in sorted(self.group_counts.items(), key=lambda item: -item[1]):
+                stats_sheet.append([group, count])
+            self._workbook.save(self.excel_file)
+        self._excel(finish)
+        if self._workbook is None and os.path.exists(self.excel_file):
+            os.remove(self.excel_file)
+        self._workbook = None
+        return self.summary()
+
+    def summary(self):
+        return {
+            'total': self.total,
+            'groups': dict(sorted(self.group_counts.items(), key=lambda item: -item[1])),
+            'min_date': self.min_date,
+            'max_date': self.max_date,
+            'excel_file': None if self.excel_error or not self.total else self.excel_file,
+            'csv_file': self.csv_file if self.total else None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_rows(rows, filename, columns=None, group_field='来源网站', background=False):
+    """
+    导出记录（可为生成器，只遍历一次）
+
+    Returns:
+        dict: 导出汇总；background=True 时立即返回 Future，result() 为导出汇总
+    """
+    def run():
+        with StreamingExport(filename, columns, group_field) as export:
+            export.write_many(rows)
+            return export.close()
+
+    if not background:
+        return run()
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(run)
+    executor.shutdown(wait=False)
+    return future
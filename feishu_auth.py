@@ -0,0 +1,177 @@
+# feishu_auth.py - 飞书 tenant_access_token 缓存（进程内共享 + 磁盘文件跨进程共享）
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from file_lock import FileLock
+from http_client import get_session
+
+TOKEN_URL = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
+
+# token 是有效凭证，不能放在会被 actions/cache 持久化的 CRAWLER_CACHE_DIR 中：
+# GitHub Actions 中默认放在每次运行独立的 RUNNER_TEMP 目录
+DEFAULT_TOKEN_CACHE_FILE = os.getenv('FEISHU_TOKEN_CACHE_FILE') or os.path.join(
+    os.getenv('RUNNER_TEMP') or os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'feishu_token.json'
+)
+
+# 距过期不足该秒数时刷新
+REFRESH_MARGIN = 300
+
+# 接口返回这些错误码时说明 token 已失效：99991661 缺少 token，99991663 token 无效，99991668 token 过期
+TOKEN_ERROR_CODES = {99991661, 99991663, 99991668}
+
+
+class TenantTokenProvider:
+    """
+    tenant_access_token 提供者
+
+    token 与过期时间先缓存在内存中，再写入加锁的磁盘文件，供其他进程
+    （定时任务、回填、测试脚本）直接复用，避免每次启动都请求一次接口。
+    token 临近过期时只有一个线程/进程负责刷新，其他调用方等待并复用结果。
+    """
+
+    def __init__(self, app_id, app_secret, session=None, cache_path=None, refresh_margin=REFRESH_MARGIN):
+        """
+        Args:
+            app_id: 飞书应用的 App ID
+            app_secret: 飞书应用的 App Secret
+            session: HTTP 会话（默认使用共享连接池）
+            cache_path: 磁盘缓存文件路径，传入空字符串时只在内存中缓存
+            refresh_margin: 距过期不足该秒数时刷新
+        """
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.session = session or get_session()
+        self.cache_path = DEFAULT_TOKEN_CACHE_FILE if cache_path is None else cache_path
+        self.refresh_margin = refresh_margin
+
+        self.token = None
+        self.expire_at = 0
+        self._lock = threading.Lock()
+
+    def _is_valid(self, token, expire_at):
+        return bool(token) and time.time() < expire_at - self.refresh_margin
+
+    def get_token(self, force=False):
+        """
+        获取有效的 token，失败时返回 None
+
+        Args:
+            force: 忽略缓存强制刷新
+        """
+        if not force and self._is_valid(self.token, self.expire_at):
+            return self.token
+
+        with self._lock:
+            # 等待锁期间其他线程可能已完成刷新
+            if not force and self._is_valid(self.token, self.expire_at):
+                return self.token
+
+            if not self.cache_path:
+                self._fetch()
+                return self.token
+
+            try:
+                with FileLock(f"{self.cache_path}.lock"):
+                    if not force:
+                        token, expire_at = self._read_cache()
+                        if self._is_valid(token, expire_at):
+                            self.token, self.expire_at = token, expire_at
+                            return self.token
+                    if self._fetch():
+                        self._write_cache()
+            except OSError as e:
+                # 缓存文件不可用时退回只在内存中缓存
+                print(f"⚠️  token 缓存文件不可用: {e}")
+                if not self._is_valid(self.token, self.expire_at):
+                    self._fetch()
+            return self.token
+
+    def invalidate(self, token):
+        """
+        接口返回 token 失效时调用；只有当前缓存的仍是这个 token 时才刷新，
+        并发失败的多个调用方只会触发一次刷新
+        """
+        with self._lock:
+            if token != self.token:
+                return
+            self.expire_at = 0
+        if self.cache_path:
+            try:
+                with FileLock(f"{self.cache_path}.lock"):
+                    cached, _ = self._read_cache()
+                    if cached == token:
+                        self._write_cache(remove=True)
+            except OSError:
+                pass
+
+    def _fetch(self):
+        """请求接口获取新 token"""
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        data = {
+            "app_id": self.app_id,
+            "app_secret": self.app_secret
+        }
+
+        try:
+            response = self.session.post(TOKEN_URL, headers=headers, data=json.dumps(data))
+            result = response.json()
+
+            if result.get("code") == 0:
+                self.token = result["tenant_access_token"]
+                self.expire_at = time.time() + result["expire"]
+                valid_until = datetime.fromtimestamp(self.expire_at - self.refresh_margin)
+                print(f"Access token 获取成功，有效期至: {valid_until}")
+                return True
+            print(f"获取 access token 失败: {result}")
+        except Exception as e:
+            print(f"获取 access token 异常: {e}")
+
+        self.token = None
+        self.expire_at = 0
+        return False
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f).get(self.app_id) or {}
+            return entry.get('token'), float(entry.get('expire_at') or 0)
+        except (OSError, ValueError, AttributeError):
+            return None, 0
+
+    def _write_cache(self, remove=False):
+        """在文件锁内调用：更新本应用的缓存条目（原子替换，权限仅限当前用户）"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            if not isinstance(entries, dict):
+                entries = {}
+        except (OSError, ValueError):
+            entries = {}
+
+        if remove:
+            entries.pop(self.app_id, None)
+        else:
+            entries[self.app_id] = {'token': self.token, 'expire_at': self.expire_at}
+
+        tmp_path = f"{self.cache_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_token_provider(app_id, app_secret):
+    """获取某应用共享的 token 提供者（同一进程内同一应用只创建一个）"""
+    with _providers_lock:
+        provider = _providers.get(app_id)
+        if provider is None or provider.app_secret != app_secret:
+            provider = TenantTokenProvider(app_id, app_secret)
+            _providers[app_id] = provider
+        return provider
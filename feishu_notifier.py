@@ -1,11 +1,14 @@
 # feishu_notifier.py
-import requests
 import json
 from datetime import datetime
 
+from http_client import get_session
+
 class FeishuNotifier:
     def __init__(self, webhook_url):
         self.webhook_url = webhook_url
+        # 共享的连接池会话
+        self.session = get_session()
 
     def send_text(self, text):
         """发送纯文本消息"""
@@ -17,7 +20,7 @@ class FeishuNotifier:
             }
         }
         try:
-            response = requests.post(self.webhook_url, headers=headers, data=json.dumps(data))
+            response = self.session.post(self.webhook_url, headers=headers, data=json.dumps(data))
             return response.json()
         except Exception as e:
             print(f"发送飞书消息失败: {e}")
@@ -135,7 +138,7 @@ https://ai.feishu.cn/base/OOYsbRScmaNEBYs5PsycX67anDb?table=tblZnQxACTwpTQN4&vie
         
         try:
             headers = {'Content-Type': 'application/json'}
-            response = requests.post(self.webhook_url, headers=headers, data=json.dumps(data))
+            response = self.session.post(self.webhook_url, headers=headers, data=json.dumps(data))
             return response.json()
         except Exception as e:
             print(f"发送飞书卡片消息失败: {e}")
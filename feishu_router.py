@@ -0,0 +1,251 @@
+# feishu_router.py - 按规则将数据分发到多个飞书多维表格
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from feishu_writer import FeishuBitableWriter
+from keyword_matcher import KeywordMatcher
+
+
+class RouteRule:
+    """
+    一条路由规则：满足任一条件的记录写入目标表格
+
+        sources     来源网站（如 3ywgg1），需要数据中保留"来源网站"列
+        keywords    搜索关键词，或标题中包含的关键词（如 天安、晋圣）
+        purchasers  采购单位中包含的文字
+    """
+
+    def __init__(self, name, table_id, app_token=None, sources=None, keywords=None, purchasers=None):
+        self.name = name
+        self.table_id = table_id
+        self.app_token = app_token
+        self.sources = list(sources or [])
+        self.keywords = list(keywords or [])
+        self.purchasers = list(purchasers or [])
+        self._keyword_matcher = KeywordMatcher(self.keywords) if self.keywords else None
+        self._purchaser_matcher = KeywordMatcher(self.purchasers) if self.purchasers else None
+
+    @classmethod
+    def from_dict(cls, config):
+        match = config.get('match', {})
+        return cls(
+            name=config.get('name') or config['table_id'],
+            table_id=config['table_id'],
+            app_token=config.get('app_token'),
+            sources=match.get('source'),
+            keywords=match.get('keyword'),
+            purchasers=match.get('purchaser'),
+        )
+
+    @staticmethod
+    def _text_column(df, column):
+        if column not in df.columns:
+            return pd.Series([''] * len(df), index=df.index)
+        return df[column].where(df[column].notna(), '').astype(str)
+
+    def match(self, df):
+        """返回命中本规则的行掩码"""
+        mask = pd.Series(False, index=df.index)
+        if self.sources:
+            mask |= self._text_column(df, '来源网站').isin(self.sources)
+        if self._keyword_matcher:
+            mask |= self._text_column(df, '搜索关键词').isin(self.keywords)
+            mask |= self._text_column(df, '标题').map(lambda text: bool(self._keyword_matcher.find(text)))
+        if self._purchaser_matcher:
+            mask |= self._text_column(df, '采购单位').map(lambda text: bool(self._purchaser_matcher.find(text)))
+        return mask
+
+
+class RoutingWriter:
+    """
+    多表格写入器：按路由规则把 DataFrame 分组到各目标表格，并发上传。
+
+    一条记录命中多条规则时写入每个命中的表格；没有命中任何规则的记录写入
+    默认表格（未配置时不上传）。每个目标表格有各自的写入器和本地去重索引，
+    所有写入器共享同一个飞书接口令牌桶和 access token。
+    """
+
+    def __init__(self, app_id, app_secret, app_token, routes, default_table_id=None,
+                 max_workers=None, **writer_kwargs):
+        """
+        Args:
+            app_id / app_secret: 飞书应用凭证
+            app_token: 默认的多维表格 app_token（规则中未指定时使用）
+            routes: RouteRule 列表
+            default_table_id: 未命中任何规则的记录写入的表格
+            max_workers: 同时上传的表格数（默认读取 FEISHU_ROUTE_WORKERS）
+            writer_kwargs: 传给 FeishuBitableWriter 的其他参数（如 debug、upsert、session）
+        """
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.app_token = app_token
+        self.routes = list(routes)
+        self.default_table_id = default_table_id
+        self.max_workers = max_workers or int(os.getenv('FEISHU_ROUTE_WORKERS', '4'))
+        # 各目标表格的写入器都必须使用本地去重索引（无法共用一个 existing_keys 集合）
+        if writer_kwargs.get('use_local_index') is False:
+            raise ValueError("多表格写入需要本地去重索引，不能传入 use_local_index=False")
+        writer_kwargs['use_local_index'] = True
+        self.writer_kwargs = writer_kwargs
+
+        self._writers = {}
+        self._writers_lock = threading.Lock()
+        # 各目标表格的名称（指向同一表格的规则名称合并），用于输出和统计
+        self._labels = {}
+        for rule in self.routes:
+            self._labels.setdefault((rule.app_token or app_token, rule.table_id), []).append(rule.name)
+        if default_table_id:
+            self._labels.setdefault((app_token, default_table_id), []).append('默认')
+
+        # 累计的各表格 (成功, 失败, 重复)
+        self.table_counts = {}
+
+        if any(rule.sources for rule in self.routes):
+            print("ℹ️  路由规则包含来源网站条件，数据中需保留'来源网站'列（SPIDER_KEEP_SOURCE=true）")
+
+    @classmethod
+    def from_config(cls, feishu_config, routes_config, **writer_kwargs):
+        """
+        由飞书配置和路由配置创建，路由配置格式：
+
+            {
+              "default_table_id": "tblxxx",
+              "routes": [
+                {"name": "天安", "table_id": "tbl1", "match": {"keyword": ["天安"]}},
+                {"name": "一公司", "table_id": "tbl2", "match": {"source": ["1ywgg1"]}},
+                {"name": "晋圣采购", "app_token": "bascn...", "table_id": "tbl3", "match": {"purchaser": ["晋圣"]}}
+              ]
+            }
+        """
+        return cls(
+            app_id=feishu_config['app_id'],
+            app_secret=feishu_config['app_secret'],
+            app_token=feishu_config['app_token'],
+            routes=[RouteRule.from_dict(route) for route in routes_config.get('routes', [])],
+            default_table_id=routes_config.get('default_table_id'),
+            **writer_kwargs
+        )
+
+    # 各目标表格各自使用本地去重索引，调用方无需预先扫描表格
+    uses_local_index = True
+
+    def _destination(self, app_token, table_id):
+        return f"{app_token or self.app_token}:{table_id}"
+
+    def get_writer(self, app_token, table_id):
+        """获取目标表格的写入器（每个表格只创建一个，后续批次复用）"""
+        destination = self._destination(app_token, table_id)
+        with self._writers_lock:
+            writer = self._writers.get(destination)
+            if writer is None:
+                writer = FeishuBitableWriter(
+                    self.app_id, self.app_secret, app_token or self.app_token, table_id, **self.writer_kwargs
+                )
+                self._writers[destination] = writer
+            return writer
+
+    def route(self, df):
+        """
+        按规则分组（多条规则指向同一表格时合并为一组）
+
+        Returns:
+            dict: {(名称, app_token, table_id): 分到该表格的 DataFrame}
+        """
+        destinations = {}
+        matched = pd.Series(False, index=df.index)
+        for rule in self.routes:
+            mask = rule.match(df)
+            matched |= mask
+            if mask.any():
+                key = (rule.app_token or self.app_token, rule.table_id)
+                previous = destinations.get(key)
+                destinations[key] = mask if previous is None else previous | mask
+
+        unmatched = ~matched
+        if unmatched.any():
+            if self.default_table_id:
+                key = (self.app_token, self.default_table_id)
+                previous = destinations.get(key)
+                destinations[key] = unmatched if previous is None else previous | unmatched
+            else:
+                print(f"⚠️  {int(unmatched.sum())} 条记录没有命中任何路由规则，且未配置默认表格，不会上传")
+
+        return {
+            ('/'.join(self._labels[key]), key[0], key[1]): df[mask]
+            for key, mask in destinations.items()
+        }
+
+    def add_records_by_table(self, df, unique_key_field='项目编号'):
+        """
+        分组后并发上传到各目标表格
+
+        Returns:
+            dict: {表格名称: (成功数量, 失败数量, 重复数量)}
+        """
+        if df.empty:
+            print("没有数据需要添加")
+            return {}
+
+        groups = self.route(df)
+        for (name, _, table_id), group in groups.items():
+            print(f"🔀 {name} -> {table_id}: {len(group)} 条")
+
+        def upload(item):
+            (name, app_token, table_id), group = item
+            try:
+                writer = self.get_writer(app_token, table_id)
+                counts = writer.add_records(group, unique_key_field=unique_key_field)
+            except Exception as e:
+                print(f"❌ 上传到 {name} ({table_id}) 失败: {e}")
+                counts = (0, len(group), 0)
+            return name, counts
+
+        workers = max(1, min(self.max_workers, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(executor.map(upload, groups.items()))
+
+        for name, (success, fail, duplicate) in results.items():
+            total = self.table_counts.get(name, (0, 0, 0))
+            self.table_counts[name] = (total[0] + success, total[1] + fail, total[2] + duplicate)
+        return results
+
+    def add_records(self, df, unique_key_field='项目编号', existing_keys=None):
+        """
+        与 FeishuBitableWriter.add_records 相同的接口，返回各表格合计的 (成功, 失败, 重复)；
+        各表格的累计结果见 table_counts。
+        
+        各表格使用自己的本地去重索引，不支持 existing_keys（传入时报错）。
+        """
+        if existing_keys is not None:
+            raise ValueError("RoutingWriter 不支持 existing_keys：各目标表格使用各自的本地去重索引")
+        results = self.add_records_by_table(df, unique_key_field)
+        success = sum(counts[0] for counts in results.values())
+        fail = sum(counts[1] for counts in results.values())
+        duplicate = sum(counts[2] for counts in results.values())
+        return success, fail, duplicate
+
+    def print_summary(self):
+        """打印各表格的累计上传结果"""
+        for name, (success, fail, duplicate) in self.table_counts.items():
+            print(f"   [{name}] 成功 {success} 条，重复 {duplicate} 条，失败 {fail} 条")
+
+
+def load_routes_config(value=None):
+    """
+    读取路由配置：FEISHU_ROUTES 可以是 JSON 文件路径，也可以直接是 JSON 字符串
+
+    Returns:
+        dict 或 None（未配置时）
+    """
+    value = value if value is not None else os.getenv('FEISHU_ROUTES', '')
+    value = value.strip()
+    if not value:
+        return None
+    if os.path.exists(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return json.loads(value)
@@ -0,0 +1,299 @@
+# feishu_stub.py - 飞书多维表格接口的本地替身（离线测试用）
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# 默认表格字段：{字段名: 字段类型}
+# 1 文本 / 2 数字 / 3 单选 / 5 日期 / 15 超链接 / 1002 修改时间
+DEFAULT_FIELDS = {
+    '项目名称': 1,
+    '发布时间': 5,
+    '采购单位': 1,
+    '项目编号': 1,
+    '链接': 15,
+    '采购方式': 1,
+    '省份': 1,
+    '城市': 1,
+    '最后更新时间': 1002,
+}
+
+
+class StubResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class LocalBitableStub:
+    """
+    在内存中模拟 tenant_access_token、fields、records、records/search、
+    records/batch_create、records/batch_update 等接口，可作为 session 传给 FeishuBitableWriter。
+
+    requests 属性记录了每次调用的 (方法, 接口)，便于统计请求次数。
+    """
+
+    def __init__(self, fields=None):
+        self.fields = dict(fields or DEFAULT_FIELDS)
+        self.records = []
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._clock = int(time.time() * 1000)
+        self._lock = threading.Lock()
+        self._throttled = 0
+        self._retry_after = 0
+        self._failures = 0
+        self._fail_after_commit = False
+        self._client_tokens = {}
+
+    # ---- 数据准备 ----
+
+    def _now(self):
+        self._clock += 1
+        return self._clock
+
+    def _new_record(self, fields):
+        now = self._now()
+        return {
+            'record_id': f"rec{next(self._ids):08d}",
+            'fields': dict(fields),
+            'created_time': now,
+            'last_modified_time': now,
+        }
+
+    def seed(self, field_rows):
+        """直接写入一批记录（不计入请求统计）"""
+        with self._lock:
+            for fields in field_rows:
+                self.records.append(self._new_record(fields))
+
+    def touch(self, record_id, **fields):
+        """修改一条记录并刷新其修改时间"""
+        with self._lock:
+            for record in self.records:
+                if record['record_id'] == record_id:
+                    record['fields'].update(fields)
+                    record['last_modified_time'] = self._now()
+                    return record
+        return None
+
+    def throttle(self, times, retry_after=0):
+        """接下来的 times 次写请求返回限频错误（HTTP 429 + 99991400）"""
+        with self._lock:
+            self._throttled = times
+            self._retry_after = retry_after
+
+    def fail_next(self, times, after_commit=False):
+        """
+        接下来的 times 次写请求返回 HTTP 500；
+        after_commit=True 时先写入数据再返回错误（模拟响应丢失）
+        """
+        with self._lock:
+            self._failures = times
+            self._fail_after_commit = after_commit
+
+    # ---- session 接口 ----
+
+    def get(self, url, params=None, **kwargs):
+        return self._dispatch('GET', url, params or {}, None)
+
+    def post(self, url, data=None, params=None, json_body=None, **kwargs):
+        body = json.loads(data) if isinstance(data, (str, bytes)) else (data or {})
+        return self._dispatch('POST', url, params or {}, body)
+
+    def _dispatch(self, method, url, params, body):
+        path = urlparse(url).path
+        endpoint = path.rstrip('/').split('/')[-1]
+        with self._lock:
+            self.requests.append((method, endpoint))
+
+            if endpoint == 'internal':
+                return StubResponse({'code': 0, 'tenant_access_token': 'stub-token', 'expire': 7200})
+            if endpoint == 'fields':
+                items = [{'field_name': name, 'type': field_type} for name, field_type in self.fields.items()]
+                return StubResponse({'code': 0, 'data': {'items': items, 'has_more': False}})
+            if endpoint == 'search' and method == 'POST':
+                return self._search(params, body)
+            if endpoint == 'records' and method == 'GET':
+                return self._list(params)
+            if endpoint == 'batch_create':
+                if self._throttled > 0:
+                    self._throttled -= 1
+                    return StubResponse({'code': 99991400, 'msg': 'request trigger frequency limit'}, 429,
+                                        {'x-ogw-ratelimit-reset': str(self._retry_after)})
+                if self._failures > 0:
+                    self._failures -= 1
+                    if self._fail_after_commit:
+                        self._batch_create(body, params.get('client_token'))
+                    return StubResponse({'code': 1255001, 'msg': 'InternalError'}, 500)
+                return self._batch_create(body, params.get('client_token'))
+            if endpoint == 'batch_update':
+                return self._batch_update(body, params.get('client_token'))
+
+        return StubResponse({'code': 404, 'msg': f'stub: unsupported endpoint {method} {path}'}, 404)
+
+    # ---- 接口实现 ----
+
+    def _check_field_names(self, names):
+        for name in names:
+            if name not in self.fields:
+                return StubResponse({'code': 1254045, 'msg': f'FieldNameNotFound: {name}'})
+        return None
+
+    def _render(self, record, field_names=None, automatic_fields=False, search_format=False):
+        fields = {}
+        for name, value in record['fields'].items():
+            if field_names and name not in field_names:
+                continue
+            # search 接口中文本字段以富文本片段列表返回
+            if search_format and self.fields.get(name) == 1 and isinstance(value, str):
+                value = [{'text': value, 'type': 'text'}]
+            fields[name] = value
+        item = {'record_id': record['record_id'], 'fields': fields}
+        if automatic_fields:
+            item['created_time'] = record['created_time']
+            item['last_modified_time'] = record['last_modified_time']
+        return item
+
+    def _matches(self, record, condition):
+        name = condition['field_name']
+        value = condition['value'][-1]
+        if self.fields.get(name) == 1002:
+            actual = record['last_modified_time']
+        else:
+            actual = record['fields'].get(name)
+        if condition['operator'] == 'isGreater':
+            return actual is not None and int(actual) > int(value)
+        if condition['operator'] == 'is':
+            return str(actual) == str(value)
+        return True
+
+    def _sort_value(self, record, name):
+        if self.fields.get(name) == 1002:
+            return record['last_modified_time']
+        value = record['fields'].get(name)
+        return (value is not None, str(value) if value is not None else '')
+
+    def _page(self, items, params, limit):
+        page_size = min(int(params.get('page_size', 20)), limit)
+        start = int(params.get('page_token') or 0)
+        page = items[start:start + page_size]
+        next_start = start + page_size
+        has_more = next_start < len(items)
+        return page, has_more, str(next_start) if has_more else ''
+
+    def _search(self, params, body):
+        field_names = body.get('field_names')
+        error = self._check_field_names(field_names or [])
+        if error:
+            return error
+
+        conditions = (body.get('filter') or {}).get('conditions', [])
+        matched = [record for record in self.records if all(self._matches(record, c) for c in conditions)]
+        for rule in reversed(body.get('sort') or []):
+            matched.sort(key=lambda record: self._sort_value(record, rule['field_name']), reverse=rule.get('desc', False))
+        page, has_more, page_token = self._page(matched, params, 500)
+        items = [self._render(record, field_names, body.get('automatic_fields'), search_format=True) for record in page]
+        return StubResponse({'code': 0, 'data': {
+            'items': items, 'has_more': has_more, 'page_token': page_token, 'total': len(matched)
+        }})
+
+    def _list(self, params):
+        page, has_more, page_token = self._page(self.records, params, 500)
+        items = [self._render(record) for record in page]
+        return StubResponse({'code': 0, 'data': {
+            'items': items, 'has_more': has_more, 'page_token': page_token, 'total': len(self.records)
+        }})
+
+    def _check_field_values(self, fields):
+        for name, value in fields.items():
+            field_type = self.fields.get(name)
+            if field_type == 5 and not isinstance(value, int):
+                return StubResponse({'code': 1254064, 'msg': f'DatetimeFieldConvFail: {name}'}, 400)
+            if field_type == 2 and not isinstance(value, (int, float)):
+                return StubResponse({'code': 1254061, 'msg': f'NumberFieldConvFail: {name}'}, 400)
+            if field_type == 15 and not isinstance(value, dict):
+                return StubResponse({'code': 1254068, 'msg': f'URLFieldConvFail: {name}'}, 400)
+        return None
+
+    def _batch_create(self, body, client_token=None):
+        # 相同 client_token 的重复请求直接返回首次结果
+        if client_token and client_token in self._client_tokens:
+            return self._client_tokens[client_token]
+        records = body.get('records', [])
+        for record in records:
+            fields = record.get('fields', {})
+            error = self._check_field_names(fields.keys()) or self._check_field_values(fields)
+            if error:
+                return error
+        created = [self._new_record(record.get('fields', {})) for record in records]
+        self.records.extend(created)
+        response = StubResponse({'code': 0, 'data': {'records': [self._render(record) for record in created]}})
+        if client_token:
+            self._client_tokens[client_token] = response
+        return response
+
+    def _batch_update(self, body, client_token=None):
+        if client_token and client_token in self._client_tokens:
+            return self._client_tokens[client_token]
+        by_id = {record['record_id']: record for record in self.records}
+        records = body.get('records', [])
+        for record in records:
+            if record.get('record_id') not in by_id:
+                return StubResponse({'code': 1254043, 'msg': f"RecordIdNotFound: {record.get('record_id')}"})
+            fields = record.get('fields', {})
+            error = self._check_field_names(fields.keys()) or self._check_field_values(fields)
+            if error:
+                return error
+        updated = []
+        for record in records:
+            target = by_id[record['record_id']]
+            target['fields'].update(record.get('fields', {}))
+            target['last_modified_time'] = self._now()
+            updated.append(target)
+        response = StubResponse({'code': 0, 'data': {'records': [self._render(record) for record in updated]}})
+        if client_token:
+            self._client_tokens[client_token] = response
+        return response
+
+
+# 离线演示：全量同步一次后，只增量获取新增/修改的记录
+def demo_projected_sync():
+    from dedupe_index import DedupeIndex
+    from feishu_writer import FeishuBitableWriter
+
+    stub = LocalBitableStub()
+    stub.seed({
+        '项目名称': f"测试项目{i}",
+        '发布时间': 1760000000000 + i * 86400000,
+        '项目编号': f"P{i:05d}",
+        '采购单位': '晋圣公司',
+    } for i in range(2000))
+
+    writer = FeishuBitableWriter('app', 'secret', 'app_token', 'table_id', use_local_index=False, session=stub)
+    with tempfile.TemporaryDirectory() as tmp:
+        writer.dedupe_index = DedupeIndex('stub', path=os.path.join(tmp, 'index.sqlite3'))
+
+        stub.requests.clear()
+        writer.sync_dedupe_index()
+        print(f"全量同步请求数: {len(stub.requests)}")
+
+        first = stub.records[0]['record_id']
+        stub.touch(first, 项目名称='测试项目0（变更）')
+        stub.seed([{'项目名称': '新增项目', '发布时间': 1770000000000, '项目编号': 'NEW'}])
+
+        stub.requests.clear()
+        writer.sync_dedupe_index()
+        print(f"增量同步请求数: {len(stub.requests)}")
+        writer.dedupe_index.close()
+
+
+if __name__ == "__main__":
+    demo_projected_sync()
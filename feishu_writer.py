@@ -1,12 +1,180 @@
-import requests
+import hashlib
 import json
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from zoneinfo import ZoneInfo
 import time
 import os
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import get_session
+from dedupe_index import DedupeIndex
+from dedupe_keys import KEY_VERSION, dedupe_key, item_key
+from near_duplicates import collapse_similar
+from feishu_auth import TOKEN_ERROR_CODES, TenantTokenProvider, get_token_provider
+from rate_limiter import get_rate_limiter
+
+# 构建唯一标识所需的字段（同步现有记录时只请求这些字段）
+KEY_FIELD_NAMES = ["项目名称", "标题", "发布时间", "项目编号"]
+
+# 写入表格的字段（与 _build_record_fields 一致），upsert 模式按这些字段计算内容哈希
+RECORD_FIELD_NAMES = ["项目名称", "发布时间", "采购单位", "项目编号", "链接", "采购方式", "省份", "城市"]
+
+# records/search 接口允许的最大分页大小
+SEARCH_PAGE_SIZE = 500
+
+# batch_create 单次请求的记录数上限与请求体大小上限（字节）
+BATCH_MAX_RECORDS = int(os.getenv('FEISHU_BATCH_SIZE', '500'))
+BATCH_MAX_BYTES = int(os.getenv('FEISHU_BATCH_MAX_BYTES', str(1024 * 1024)))
+
+# 飞书限频错误码：99991400 应用请求频率超限，1254290 请求过快，1254291 同一数据表写冲突
+RATE_LIMIT_CODES = {99991400, 1254290, 1254291}
+
+# 可重试的临时错误码：1254607 数据未就绪，1255001/1255002 服务内部错误，1255040 请求超时
+TRANSIENT_ERROR_CODES = {1254607, 1255001, 1255002, 1255040}
+
+# 记录内容错误码：1254001 请求体错误（1254060~1254069 为各类字段值转换失败），拆分批次可定位到具体记录
+DATA_ERROR_CODES = {1254001}
+
+# 表格结构错误码：1254045 字段名不存在，与具体记录无关，整批失败且不拆分
+SCHEMA_ERROR_CODES = {1254045}
+
+# 表格结构缓存文件及有效期（小时）
+DEFAULT_SCHEMA_CACHE_FILE = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'feishu_schema.json')
+SCHEMA_CACHE_HOURS = float(os.getenv('FEISHU_SCHEMA_CACHE_HOURS', '24'))
+
+# 各字段的数据来源列（按顺序取第一个非空值；未列出的字段取同名列）
+FIELD_SOURCE_COLUMNS = {'项目名称': ['项目名称', '标题']}
+
+# 发布时间所在时区（无时区信息的日期按此时区换算时间戳，与运行机器的本地时区无关）
+FEISHU_TIMEZONE = ZoneInfo(os.getenv('FEISHU_TIMEZONE', 'Asia/Shanghai'))
+
+# 常见的发布时间格式，按优先级排列
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d', '%Y年%m月%d日', '%Y.%m.%d')
+
+_EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+def _parse_date_strings(values, tz):
+    """
+    解析去重后的日期字符串，返回带时区的 DatetimeIndex（无法解析为 NaT）
+
+    先用全部值探测出匹配最多的格式并整体解析，剩余的值依次尝试其他格式，
+    最后才逐个交给 pandas 的通用解析。
+    """
+    values = pd.Index(values, dtype=object)
+    parsed = {
+        fmt: pd.to_datetime(values, format=fmt, errors='coerce')
+        for fmt in DATE_FORMATS
+    }
+    best = max(DATE_FORMATS, key=lambda fmt: parsed[fmt].notna().sum())
+    result = parsed[best].tz_localize(tz)
+    
+    for fmt in DATE_FORMATS:
+        missing = result.isna()
+        if not missing.any():
+            return result
+        if fmt != best:
+            result = result.where(~missing, parsed[fmt].tz_localize(tz))
+    
+    # 格式都不匹配的值逐个通用解析（带时区的值换算到目标时区）
+    fallback = []
+    for value, ts in zip(values, result):
+        if pd.isna(ts):
+            try:
+                ts = pd.to_datetime(value, errors='coerce')
+            except (ValueError, TypeError, OverflowError):
+                ts = pd.NaT
+            if pd.notna(ts):
+                ts = ts.tz_convert(tz) if ts.tzinfo else ts.tz_localize(tz)
+        fallback.append(ts)
+    return pd.DatetimeIndex(fallback, tz=tz)
+
+
+def dates_to_epoch_ms(values, tz=FEISHU_TIMEZONE):
+    """
+    将一列日期批量转换为飞书日期字段所需的毫秒时间戳
+
+    每个不同的日期字符串只解析一次；空值和无法解析的值返回 None。
+
+    Args:
+        values: 日期字符串序列（Series / list）
+        tz: 无时区信息的日期所在的时区
+
+    Returns:
+        list: 与输入等长的毫秒时间戳（int）或 None
+    """
+    series = pd.Series(list(values), dtype=object)
+    text = series.where(series.notna(), '').astype(str).str.strip()
+    uniques = [value for value in pd.unique(text) if value]
+    if not uniques:
+        return [None] * len(series)
+    
+    parsed = _parse_date_strings(uniques, tz)
+    millis = (parsed - _EPOCH) // pd.Timedelta(milliseconds=1)
+    lookup = {
+        value: int(ms) if pd.notna(ms) else None
+        for value, ms in zip(uniques, millis)
+    }
+    return [lookup.get(value) for value in text]
+
+
+def _text_array(series):
+    """整列转为字符串数组，空值和空字符串为 None"""
+    result = np.full(len(series), None, dtype=object)
+    mask = series.notna().to_numpy()
+    if mask.any():
+        values = series[mask]
+        values = values.astype(str) if values.dtype == object else values.map(str)
+        result[mask] = values.to_numpy(dtype=object)
+        result[result == ''] = None
+    return result
+
+
+def _convert_text(series):
+    return _text_array(series)
+
+
+def _convert_number(series):
+    result = np.full(len(series), None, dtype=object)
+    numbers = pd.to_numeric(series, errors='coerce')
+    mask = numbers.notna().to_numpy()
+    result[mask] = [int(value) if float(value).is_integer() else float(value) for value in numbers[mask]]
+    return result
+
+
+def _convert_date(series):
+    result = _text_array(series)
+    mask = result != None  # noqa: E711  逐元素比较
+    if mask.any():
+        result[mask] = dates_to_epoch_ms(result[mask])
+    return result
+
+
+def _convert_url(series):
+    result = _text_array(series)
+    mask = result != None  # noqa: E711
+    result[mask] = [{"link": value, "text": "查看详情"} for value in result[mask]]
+    return result
+
+
+# 字段类型 -> 整列转换函数（1 文本 / 2 数字 / 3 单选 / 5 日期 / 15 超链接）
+FIELD_CONVERTERS = {
+    1: _convert_text,
+    2: _convert_number,
+    3: _convert_text,
+    5: _convert_date,
+    15: _convert_url,
+}
+
 
 class FeishuBitableWriter:
-    def __init__(self, app_id, app_secret, app_token, table_id, debug=False):
+    def __init__(self, app_id, app_secret, app_token, table_id, debug=False, use_local_index=None, session=None,
+                 upsert=None):
         """
         初始化飞书多维表格写入器
         
@@ -16,6 +184,9 @@ class FeishuBitableWriter:
             app_token: 多维表格的 app_token (从URL获取)
             table_id: 多维表格的 table_id (从URL获取)
             debug: 是否启用调试模式
+            use_local_index: 是否使用本地去重索引（默认读取 FEISHU_LOCAL_INDEX，未设置时启用）
+            session: 自定义的 HTTP 会话（默认使用共享连接池；离线测试时可传入 feishu_stub.LocalBitableStub）
+            upsert: 是否更新内容有变化的已有记录（默认读取 FEISHU_UPSERT，未设置时只新增；需要本地去重索引）
         """
         self.app_id = app_id
         self.app_secret = app_secret
@@ -25,36 +196,68 @@ class FeishuBitableWriter:
         self.token_expire_time = 0
         self.debug = debug
         
+        # 共享的连接池会话（默认超时、keep-alive、gzip）
+        self.session = session or get_session()
+        
+        # token 在进程内和进程间（磁盘缓存）共享；自定义会话时只在内存中缓存
+        if session is None:
+            self.token_provider = get_token_provider(app_id, app_secret)
+        else:
+            self.token_provider = TenantTokenProvider(app_id, app_secret, session=session, cache_path='')
+        
+        # 增量同步依据的"修改时间"字段（表格中需有该类型字段）
+        self.modified_time_field = os.getenv('FEISHU_MODIFIED_TIME_FIELD', '最后更新时间')
+        
+        # 表格结构（带版本戳）及据此编译的字段转换器；自定义会话时不使用磁盘缓存
+        self.schema_cache_path = DEFAULT_SCHEMA_CACHE_FILE if session is None else ''
+        self._schema = None
+        self._schema_lock = threading.Lock()
+        self._compiled_converters = {}
+        
+        # 并发上传：同一进程内所有写入器共享飞书接口的令牌桶
+        self.upload_workers = int(os.getenv('FEISHU_UPLOAD_WORKERS', '4'))
+        self.upload_limiter = get_rate_limiter('open.feishu.cn')
+        self.max_rate_limit_retries = 5
+        
+        # 临时错误的重试次数和退避基数（秒）
+        self.max_retries = int(os.getenv('FEISHU_MAX_RETRIES', '3'))
+        self.retry_backoff = 1.0
+        
         # 检查必要的配置
         if not all([app_id, app_secret, app_token, table_id]):
             raise ValueError("飞书配置参数不全，请提供完整的app_id, app_secret, app_token, table_id")
         
+        # 本地去重索引：唯一标识 -> record_id，上传成功后更新，定期与远端增量同步
+        if use_local_index is None:
+            use_local_index = os.getenv('FEISHU_LOCAL_INDEX', 'true').lower() == 'true'
+        self.dedupe_index = None
+        if use_local_index:
+            sync_hours = float(os.getenv('FEISHU_INDEX_SYNC_HOURS', '24'))
+            reconcile_hours = float(os.getenv('FEISHU_INDEX_RECONCILE_HOURS', '168'))
+            # 命名空间带上标识规则版本，规则变化后首次使用时与远端全量对账重建
+            self.dedupe_index = DedupeIndex(
+                f"{app_token}:{table_id}:k{KEY_VERSION}", sync_hours=sync_hours, reconcile_hours=reconcile_hours
+            )
+        # FEISHU_INDEX_RECONCILE=true 时本次运行首次同步强制全量对账
+        self._force_reconcile = os.getenv('FEISHU_INDEX_RECONCILE', 'false').lower() == 'true'
+        
+        # upsert 模式：本地索引记录每条记录的内容哈希，内容变化时通过 batch_update 更新
+        if upsert is None:
+            upsert = os.getenv('FEISHU_UPSERT', 'false').lower() == 'true'
+        self.upsert = bool(upsert and self.dedupe_index)
+        if upsert and not self.dedupe_index:
+            print("⚠️  upsert 模式需要本地去重索引，已退回只新增模式")
+        
+        # 每个相似公告分组只上传首条公告（重发、变更公告不再新增记录）
+        self.collapse_similar = os.getenv('FEISHU_COLLAPSE_SIMILAR', 'false').lower() == 'true'
+        
         # 初始化时获取token
         self._get_access_token()
     
     def _get_access_token(self):
-        """获取飞书开放平台接口调用凭证"""
-        url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-        headers = {"Content-Type": "application/json; charset=utf-8"}
-        data = {
-            "app_id": self.app_id,
-            "app_secret": self.app_secret
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, data=json.dumps(data))
-            result = response.json()
-            
-            if result.get("code") == 0:
-                self.access_token = result["tenant_access_token"]
-                self.token_expire_time = time.time() + result["expire"] - 300
-                print(f"Access token 获取成功，有效期至: {datetime.fromtimestamp(self.token_expire_time)}")
-            else:
-                print(f"获取 access token 失败: {result}")
-                self.access_token = None
-        except Exception as e:
-            print(f"获取 access token 异常: {e}")
-            self.access_token = None
+        """获取飞书开放平台接口调用凭证（优先使用缓存，临近过期时才请求接口）"""
+        self.access_token = self.token_provider.get_token()
+        self.token_expire_time = self.token_provider.expire_at - self.token_provider.refresh_margin
     
     def _check_token(self):
         """检查token是否有效，无效则重新获取"""
@@ -62,13 +265,19 @@ class FeishuBitableWriter:
             print("Access token 已过期或无效，重新获取...")
             self._get_access_token()
     
-    def add_records(self, df, unique_key_field='项目编号'):
+    def add_records(self, df, unique_key_field='项目编号', existing_keys=None):
         """
         将DataFrame中的数据添加到飞书多维表格
         
         Args:
             df: 包含要添加数据的DataFrame
             unique_key_field: 用于去重的唯一标识字段名
+            existing_keys: 已存在记录的唯一标识集合（分批上传时传入同一个集合，
+                           避免每批都重新扫描整张表；新增记录会加入该集合）。
+                           未传入时使用本地去重索引，只查询本批数据的标识
+        
+        upsert 模式下，已存在且内容哈希变化的记录会被更新（计入成功数量），
+        内容未变化的记录不产生任何接口调用。
         
         Returns:
             tuple: (成功数量, 失败数量, 重复数量)
@@ -82,158 +291,512 @@ class FeishuBitableWriter:
             print("无法获取有效的 access token，停止操作")
             return 0, 0, 0
         
-        print("🔍 开始获取现有记录用于去重...")
-        existing_records = self._get_existing_records()
-        existing_keys = set(existing_records.keys()) if existing_records else set()
+        # 相似公告只保留每组首条，去掉的记录计入重复数量
+        collapsed = 0
+        if self.collapse_similar:
+            df, collapsed = collapse_similar(df, self._row_unique_key)
+            if collapsed:
+                print(f"🔗 跳过 {collapsed} 条相似公告（重发或变更公告）")
+            if df.empty:
+                return 0, 0, collapsed
         
-        print(f"当前表格已有 {len(existing_keys)} 条记录")
+        # 按表格结构编译字段转换器（获取失败时使用默认字段映射）
+        try:
+            converters = self._compile_converters(list(df.columns))
+        except Exception as e:
+            print(f"⚠️  获取表格结构失败，使用默认字段映射: {e}")
+            converters = None
+        
+        # 按列一次性计算唯一标识和字段数据
+        unique_keys, field_payloads = self._build_records_columnar(df, converters)
+        
+        if existing_keys is None:
+            if self.dedupe_index:
+                if self._force_reconcile or self.dedupe_index.needs_sync():
+                    self.sync_dedupe_index()
+                existing_keys = self.dedupe_index.lookup(unique_keys)
+                print(f"本地去重索引共 {self.dedupe_index.count()} 条记录，本批命中 {len(existing_keys)} 条")
+            else:
+                existing_keys = self.load_existing_keys()
+        
+        # upsert 模式：取出已有记录的 record_id 和上次写入的内容哈希
+        stored_records = self.dedupe_index.get_records(existing_keys) if self.upsert else {}
         
         # 准备要添加的新记录
         new_records = []
-        duplicate_count = 0
+        new_keys = []
+        update_records = []
+        update_keys = []
+        duplicate_count = collapsed
         
-        for idx, row in df.iterrows():
-            # 构建唯一标识（使用标题+发布时间组合）
-            record_title = str(row.get('项目名称', '')) if pd.notna(row.get('项目名称')) else ''
-            if not record_title:
-                record_title = str(row.get('标题', '')) if pd.notna(row.get('标题')) else ''
-            
-            publish_date = str(row.get('发布时间', '')) if pd.notna(row.get('发布时间')) else ''
-            
-            if record_title and publish_date:
-                unique_key = f"{record_title}_{publish_date}"
-            else:
-                # 如果没有标题和日期，使用项目编号
-                unique_key = str(row.get('项目编号', '')) if pd.notna(row.get('项目编号')) else ''
-                if not unique_key:
-                    continue  # 如果没有唯一标识，跳过
+        for unique_key, record_data in zip(unique_keys, field_payloads):
+            if not unique_key:
+                continue  # 如果没有唯一标识，跳过
             
             # 去重检查
             if unique_key in existing_keys:
+                stored = stored_records.pop(unique_key, None)
+                # 未记录内容哈希的旧记录按已变更处理，更新一次后即有哈希
+                if stored and stored[0] and record_data and stored[1] != self._content_hash(record_data):
+                    update_records.append({"record_id": stored[0], "fields": record_data})
+                    update_keys.append(unique_key)
+                    continue
                 duplicate_count += 1
                 if self.debug and duplicate_count <= 3:
                     print(f"  跳过重复记录: {unique_key[:50]}...")
                 continue
             
-            record_data = self._build_record_fields(row)
             if record_data:
                 new_records.append({"fields": record_data})
+                new_keys.append(unique_key)
                 existing_keys.add(unique_key)
         
-        if not new_records:
+        if not new_records and not update_records:
             print(f"所有 {len(df)} 条记录都已存在，没有新数据需要添加")
             return 0, 0, duplicate_count
         
-        print(f"准备添加 {len(new_records)} 条新记录，跳过 {duplicate_count} 条重复记录")
+        if update_records:
+            print(f"准备添加 {len(new_records)} 条新记录，更新 {len(update_records)} 条有变化的记录，"
+                  f"跳过 {duplicate_count} 条重复记录")
+        else:
+            print(f"准备添加 {len(new_records)} 条新记录，跳过 {duplicate_count} 条重复记录")
         
-        # 分批添加记录
-        success_count = 0
-        fail_count = 0
-        batch_size = 100
+        # 按记录数和请求体大小分批，多个批次在令牌桶限速下并发上传
+        batches = [('batch_create',) + batch for batch in self._plan_batches(new_records, new_keys)]
+        batches += [('batch_update',) + batch for batch in self._plan_batches(update_records, update_keys)]
+        workers = max(1, min(self.upload_workers, len(batches)))
+        if len(batches) > 1:
+            print(f"分 {len(batches)} 批上传（并发 {workers}）")
         
-        for i in range(0, len(new_records), batch_size):
-            batch = new_records[i:i+batch_size]
-            batch_success, batch_fail = self._add_batch_records(batch)
-            success_count += batch_success
-            fail_count += batch_fail
-            
-            if i + batch_size < len(new_records):
-                time.sleep(0.5)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda batch: self._write_batch(*batch), batches))
         
+        success_count = sum(success for success, _ in results)
+        fail_count = sum(fail for _, fail in results)
         return success_count, fail_count, duplicate_count
     
+    @staticmethod
+    def _plan_batches(records, unique_keys, max_records=None, max_bytes=None):
+        """
+        按顺序将记录切分为批次，每批不超过记录数上限和请求体大小上限
+        
+        Returns:
+            list: [(记录列表, 唯一标识列表), ...]
+        """
+        max_records = max_records or BATCH_MAX_RECORDS
+        max_bytes = max_bytes or BATCH_MAX_BYTES
+        # {"records": [...]} 外层结构的固定开销
+        overhead = len('{"records": []}')
+        
+        batches = []
+        batch, batch_keys, batch_bytes = [], [], overhead
+        for record, key in zip(records, unique_keys):
+            # 与实际发送的序列化方式一致（json.dumps 默认转义非 ASCII 字符）
+            size = len(json.dumps(record)) + 2
+            if batch and (len(batch) >= max_records or batch_bytes + size > max_bytes):
+                batches.append((batch, batch_keys))
+                batch, batch_keys, batch_bytes = [], [], overhead
+            batch.append(record)
+            batch_keys.append(key)
+            batch_bytes += size
+        if batch:
+            batches.append((batch, batch_keys))
+        return batches
+    
+    @staticmethod
+    def _retry_after(response, default=1.0):
+        """从响应头读取服务端要求的等待秒数"""
+        headers = getattr(response, 'headers', None) or {}
+        for name in ('Retry-After', 'x-ogw-ratelimit-reset'):
+            value = headers.get(name)
+            if value:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    continue
+        return default
+    
+    def _row_unique_key(self, row):
+        """构建唯一标识（规范化的标题+发布时间，缺失时使用项目编号，见 dedupe_keys.item_key）"""
+        return item_key(row)
+    
+    @staticmethod
+    def _field_text(value):
+        """飞书返回的字段值转为文本（文本字段可能以 [{"text": ...}] 形式返回）"""
+        if isinstance(value, list):
+            return ''.join(str(part.get('text', '')) if isinstance(part, dict) else str(part) for part in value)
+        if isinstance(value, dict):
+            return str(value.get('text') or value.get('link') or '')
+        return '' if value is None else str(value)
+    
+    def _record_unique_key(self, fields):
+        """由远端记录字段构建唯一标识（与 _row_unique_key 规则一致）"""
+        title = self._field_text(fields.get("项目名称"))
+        if not title:
+            title = self._field_text(fields.get("标题"))
+        
+        # 日期字段以毫秒时间戳返回，转回与本地数据一致的 YYYY-MM-DD
+        publish_date = fields.get("发布时间", "")
+        if isinstance(publish_date, (int, float)) and not isinstance(publish_date, bool):
+            publish_date = datetime.fromtimestamp(publish_date / 1000, FEISHU_TIMEZONE).strftime('%Y-%m-%d')
+        return dedupe_key(title, self._field_text(publish_date), self._field_text(fields.get("项目编号")))
+    
+    def sync_dedupe_index(self, full=False):
+        """
+        将远端表格同步到本地去重索引
+        
+        首次（或 full=True）全量同步并重建索引；之后只获取上次同步游标之后
+        创建或修改的记录。两种方式都只请求唯一标识相关字段。
+        
+        Returns:
+            bool: 是否同步成功
+        """
+        if not self.dedupe_index:
+            return False
+        
+        full = full or self._force_reconcile
+        cursor = None if full else self.dedupe_index.get_sync_cursor()
+        print("🔄 本地去重索引与飞书表格" + ("全量对账..." if cursor is None else "增量同步..."))
+        
+        try:
+            records, new_cursor, hashes = self._fetch_record_keys(modified_since=cursor)
+        except Exception as e:
+            # 同步失败时保留原索引和游标，下次重试
+            print(f"❌ 同步去重索引失败: {e}")
+            return False
+        
+        if cursor is None:
+            self.dedupe_index.replace_all(records, hashes)
+        else:
+            self.dedupe_index.add_many((key, record_id, hashes.get(key)) for key, record_id in records.items())
+        self.dedupe_index.mark_synced(new_cursor)
+        if cursor is None:
+            self._force_reconcile = False
+        
+        print(f"✅ 同步完成，本次获取 {len(records)} 条，索引共 {self.dedupe_index.count()} 条记录")
+        return True
+    
+    def reconcile_dedupe_index(self):
+        """与远端表格全量对账，重建本地去重索引"""
+        return self.sync_dedupe_index(full=True)
+    
+    @property
+    def uses_local_index(self):
+        """是否使用本地去重索引（是则调用方无需预先扫描表格、传入 existing_keys）"""
+        return bool(self.dedupe_index)
+    
+    def load_existing_keys(self):
+        """获取表格中现有记录的唯一标识集合"""
+        print("🔍 开始获取现有记录用于去重...")
+        existing_records = self._get_existing_records()
+        existing_keys = set(existing_records.keys()) if existing_records else set()
+        
+        print(f"当前表格已有 {len(existing_keys)} 条记录")
+        return existing_keys
+    
     def _get_existing_records(self):
         """
-        获取表格中现有的记录
+        获取表格中现有的记录（只请求构建唯一标识所需的字段）
         
         Returns:
             dict: {唯一标识: 记录ID} 的映射
         """
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records"
+        existing_records = {}
+        try:
+            existing_records, _, _ = self._fetch_record_keys()
+        except Exception as e:
+            print(f"获取现有记录异常: {e}")
+        
+        print(f"获取到 {len(existing_records)} 条现有记录")
+        return existing_records
+    
+    def _iter_records(self, field_names=None, filter_conditions=None, sort=None, page_size=SEARCH_PAGE_SIZE):
+        """
+        通过 records/search 接口分页遍历记录
+        
+        Args:
+            field_names: 只返回这些字段（None 表示全部字段）
+            filter_conditions: 筛选条件列表（and 连接）
+            sort: 排序规则，如 [{"field_name": "最后更新时间", "desc": True}]
+            page_size: 每页条数（接口上限 500）
+        
+        Yields:
+            dict: 记录（含 record_id、fields 以及 created_time/last_modified_time）
+        
+        Raises:
+            RuntimeError: 接口返回错误
+        """
+        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/search"
         headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
         
-        existing_records = {}
+        body = {"automatic_fields": True}
+        if field_names:
+            body["field_names"] = list(field_names)
+        if filter_conditions:
+            body["filter"] = {"conjunction": "and", "conditions": filter_conditions}
+        if sort:
+            body["sort"] = sort
+        
         page_token = ""
-        page_size = 100
+        while True:
+            params = {"page_size": page_size}
+            if page_token:
+                params["page_token"] = page_token
+            
+            response = self.session.post(url, headers=headers, params=params, data=json.dumps(body))
+            
+            if self.debug:
+                print(f"  获取记录 - 状态码: {response.status_code}")
+            
+            result = response.json()
+            if result.get("code") != 0:
+                raise RuntimeError(f"获取记录失败: {result.get('msg')}")
+            
+            data = result.get("data", {})
+            for item in data.get("items", []) or []:
+                yield item
+            
+            page_token = data.get("page_token", "")
+            if not data.get("has_more") or not page_token:
+                break
+    
+    def _get_table_field_names(self):
+        """表格中的字段名集合"""
+        return set(self.get_table_schema())
+    
+    def get_table_schema(self, refresh=False):
+        """
+        表格字段结构 {字段名: 字段类型}
+        
+        首次调用时读取磁盘缓存（有效期 FEISHU_SCHEMA_CACHE_HOURS），过期或 refresh=True
+        时重新请求 fields 接口；每份结构带有由字段名和类型计算的版本戳。
         
+        Raises:
+            RuntimeError: 接口返回错误
+        """
+        return self._get_schema(refresh)['fields']
+    
+    def _get_schema(self, refresh=False):
+        """返回 {'version': 版本戳, 'fetched_at': 获取时间, 'fields': {字段名: 字段类型}}"""
+        with self._schema_lock:
+            if self._schema is None or refresh:
+                schema = None if refresh else self._read_schema_cache()
+                if schema is None:
+                    fields = self._fetch_table_fields()
+                    schema = {
+                        'version': hashlib.md5(json.dumps(list(fields.items()), ensure_ascii=False).encode('utf-8')).hexdigest()[:12],
+                        'fetched_at': time.time(),
+                        'fields': fields,
+                    }
+                    self._write_schema_cache(schema)
+                    print(f"📋 已获取表格结构：{len(fields)} 个字段（版本 {schema['version']}）")
+                self._schema = schema
+            return self._schema
+    
+    def invalidate_schema(self):
+        """表格结构可能已变化（例如字段被删除），下次使用时重新获取"""
+        with self._schema_lock:
+            self._schema = None
+        self._write_schema_cache(None)
+    
+    def _fetch_table_fields(self):
+        """分页获取全部字段，返回 {字段名: 字段类型}（保持表格中的字段顺序）"""
+        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/fields"
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        fields = {}
+        page_token = ""
+        while True:
+            params = {"page_size": 100}
+            if page_token:
+                params["page_token"] = page_token
+            result = self.session.get(url, headers=headers, params=params).json()
+            if result.get("code") != 0:
+                raise RuntimeError(f"获取字段列表失败: {result.get('msg')}")
+            data = result.get("data", {})
+            for field in data.get("items", []) or []:
+                fields[field.get("field_name")] = field.get("type")
+            page_token = data.get("page_token", "")
+            if not data.get("has_more") or not page_token:
+                return fields
+    
+    def _schema_cache_key(self):
+        return f"{self.app_token}:{self.table_id}"
+    
+    def _read_schema_cache(self):
+        if not self.schema_cache_path:
+            return None
         try:
-            while True:
-                params = {"page_size": page_size}
-                if page_token:
-                    params["page_token"] = page_token
-                
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-                
-                if self.debug:
-                    print(f"  获取现有记录 - 状态码: {response.status_code}")
-                
-                result = response.json()
-                
-                if result.get("code") == 0:
-                    data = result.get("data", {})
-                    items = data.get("items", [])
-                    
-                    for item in items:
-                        record_id = item.get("record_id")
-                        fields = item.get("fields", {})
-                        
-                        # 构建唯一标识（与添加时一致）
-                        title = fields.get("项目名称", "")
-                        if not title:
-                            title = fields.get("标题", "")
-                        publish_date = fields.get("发布时间", "")
-                        
-                        if title and publish_date:
-                            unique_key = f"{title}_{publish_date}"
-                        else:
-                            unique_key = fields.get("项目编号", "")
-                        
-                        if unique_key:
-                            existing_records[str(unique_key)] = record_id
-                        else:
-                            # 如果没有唯一标识，使用record_id
-                            existing_records[record_id] = record_id
-                    
-                    page_token = data.get("page_token", "")
-                    if not page_token:
-                        break
-                else:
-                    print(f"❌ 获取现有记录失败: {result.get('msg')}")
-                    break
-                    
-        except Exception as e:
-            print(f"获取现有记录异常: {e}")
+            with open(self.schema_cache_path, 'r', encoding='utf-8') as f:
+                schema = json.load(f).get(self._schema_cache_key())
+        except (OSError, ValueError, AttributeError):
+            return None
+        if not schema or time.time() - schema.get('fetched_at', 0) >= SCHEMA_CACHE_HOURS * 3600:
+            return None
+        return schema
+    
+    def _write_schema_cache(self, schema):
+        """写入（schema 为 None 时删除）本表格的结构缓存"""
+        if not self.schema_cache_path:
+            return
+        try:
+            try:
+                with open(self.schema_cache_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+            if schema is None:
+                if entries.pop(self._schema_cache_key(), None) is None:
+                    return
+            else:
+                entries[self._schema_cache_key()] = schema
+            os.makedirs(os.path.dirname(self.schema_cache_path) or '.', exist_ok=True)
+            tmp_path = f"{self.schema_cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.schema_cache_path)
+        except OSError as e:
+            print(f"⚠️  写入表格结构缓存失败: {e}")
+    
+    def _compile_converters(self, columns):
+        """
+        根据表格结构为 DataFrame 的列编译字段转换器（按结构版本和列集合缓存）
         
-        print(f"获取到 {len(existing_records)} 条现有记录")
-        return existing_records
+        Returns:
+            list: [(字段名, 来源列列表, 转换函数), ...]
+        """
+        schema = self._get_schema()
+        cache_key = (schema['version'], tuple(columns))
+        compiled = self._compiled_converters.get(cache_key)
+        if compiled is not None:
+            return compiled
+        
+        compiled = []
+        used_columns = set()
+        for field_name, field_type in schema['fields'].items():
+            sources = [column for column in FIELD_SOURCE_COLUMNS.get(field_name, [field_name]) if column in columns]
+            if not sources:
+                continue
+            used_columns.update(sources)
+            converter = FIELD_CONVERTERS.get(field_type)
+            if converter is None:
+                print(f"⚠️  字段 '{field_name}' 的类型 ({field_type}) 暂不支持写入，已忽略")
+                continue
+            compiled.append((field_name, sources, converter))
+        
+        # 表格中没有对应字段的列在上传前剔除，而不是让整批请求失败
+        rejected = [column for column in columns if column not in used_columns]
+        if rejected:
+            print(f"⚠️  以下列在飞书表格中没有对应字段，不会上传: {', '.join(map(str, rejected))}")
+        
+        self._compiled_converters[cache_key] = compiled
+        return compiled
+    
+    @staticmethod
+    def _apply_converters(df, converters):
+        """按编译好的转换器整列转换，返回字段字典列表"""
+        names = []
+        field_columns = []
+        for field_name, sources, converter in converters:
+            series = df[sources[0]]
+            for column in sources[1:]:
+                # 前一来源为空值或空字符串时取下一来源
+                fallback = df[column]
+                series = series.where(series.notna() & (series.astype(str) != ''), fallback)
+            names.append(field_name)
+            field_columns.append(converter(series).tolist())
+        return [
+            {name: value for name, value in zip(names, row) if value is not None}
+            for row in zip(*field_columns)
+        ] if field_columns else [{} for _ in range(len(df))]
+    
+    def _fetch_record_keys(self, modified_since=None):
+        """
+        只请求唯一标识相关字段，构建 {唯一标识: 记录ID}
+        
+        Args:
+            modified_since: 毫秒时间戳，只获取此后创建或修改的记录
+                            （需要表格中有 self.modified_time_field 字段，否则退回全量）
+        
+        Returns:
+            tuple: ({唯一标识: 记录ID}, 本次见到的最大 last_modified_time, {唯一标识: 内容哈希})；
+                   只有 upsert 模式才请求全部写入字段并计算内容哈希，否则哈希为空字典
+        """
+        table_fields = self._get_table_field_names()
+        wanted = KEY_FIELD_NAMES + RECORD_FIELD_NAMES if self.upsert else KEY_FIELD_NAMES
+        field_names = [name for name in dict.fromkeys(wanted) if name in table_fields]
+        
+        filter_conditions = None
+        sort = None
+        incremental = False
+        if modified_since is not None:
+            if self.modified_time_field in table_fields:
+                # 日期筛选按天比较，往前多取一天；再按修改时间倒序，遇到游标之前的记录即停止
+                filter_conditions = [{
+                    "field_name": self.modified_time_field,
+                    "operator": "isGreater",
+                    "value": ["ExactDate", str(int(modified_since) - 86400000)]
+                }]
+                sort = [{"field_name": self.modified_time_field, "desc": True}]
+                incremental = True
+            else:
+                print(f"⚠️  表格中没有 '{self.modified_time_field}' 字段，无法增量同步，执行全量同步")
+        
+        records = {}
+        hashes = {}
+        cursor = modified_since or 0
+        for item in self._iter_records(field_names=field_names, filter_conditions=filter_conditions, sort=sort):
+            if incremental and (item.get("last_modified_time") or 0) <= modified_since:
+                break
+            record_id = item.get("record_id")
+            fields = item.get("fields", {})
+            unique_key = self._record_unique_key(fields)
+            # 如果没有唯一标识，使用record_id
+            key = str(unique_key) if unique_key else record_id
+            records[key] = record_id
+            if self.upsert:
+                hashes[key] = self._content_hash(fields)
+            cursor = max(cursor, item.get("last_modified_time") or 0, item.get("created_time") or 0)
+        
+        return records, cursor, hashes
+    
+    @classmethod
+    def _content_hash(cls, fields):
+        """
+        写入字段内容的哈希
+        
+        本地构建的字段和远端返回的字段（富文本、超链接对象）统一为文本后计算，
+        两者内容相同时哈希相同；空值不参与计算。
+        """
+        normalized = {}
+        for name in RECORD_FIELD_NAMES:
+            value = fields.get(name)
+            if isinstance(value, dict):
+                value = str(value.get('link') or value.get('text') or '')
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(int(value))
+            else:
+                value = cls._field_text(value)
+            if value:
+                normalized[name] = value
+        payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()
     
     def _format_date_for_feishu(self, date_str):
         """
         将字符串日期转换为飞书API所需的Unix时间戳（毫秒）
+        
+        整列转换请使用 dates_to_epoch_ms
         """
         if not date_str or pd.isna(date_str):
             return None
         
-        try:
-            # 尝试解析常见的日期字符串格式
-            for fmt in ('%Y-%m-%d', '%Y/%m/%d', '%Y年%m月%d日', '%Y.%m.%d'):
-                try:
-                    dt = datetime.strptime(str(date_str).strip(), fmt)
-                    return int(dt.timestamp() * 1000)
-                except ValueError:
-                    continue
-            # 使用pandas的灵活解析
-            dt = pd.to_datetime(date_str, errors='coerce')
-            if pd.isna(dt):
-                return None
-            return int(dt.timestamp() * 1000)
-        except Exception as e:
-            if self.debug:
-                print(f"⚠️ 日期转换失败: {date_str}, 错误: {e}")
-            return None
+        timestamp = dates_to_epoch_ms([date_str])[0]
+        if timestamp is None and self.debug:
+            print(f"⚠️ 日期转换失败: {date_str}")
+        return timestamp
     
     def _build_record_fields(self, row):
         """将DataFrame行转换为飞书多维表格字段格式"""
@@ -286,40 +849,246 @@ class FeishuBitableWriter:
         
         return fields
     
-    def _add_batch_records(self, records):
-        """批量添加记录到飞书多维表格"""
-        if not records:
-            return 0, 0
+    @staticmethod
+    def _str_column(series):
+        """与逐行 str(value) 结果一致的整列字符串转换"""
+        if series.dtype == object:
+            return series.astype(str)
+        return series.map(str)
+    
+    def _column_values(self, df, column):
+        """
+        返回 (非空掩码, 字符串值) 两个数组；列不存在时掩码全为 False
+        """
+        if column not in df.columns:
+            return np.zeros(len(df), dtype=bool), np.full(len(df), '', dtype=object)
+        series = df[column]
+        mask = series.notna().to_numpy()
+        values = np.full(len(df), '', dtype=object)
+        if mask.any():
+            values[mask] = self._str_column(series[mask]).to_numpy(dtype=object)
+        return mask, values
+    
+    def _build_records_columnar(self, df, converters=None):
+        """
+        按列一次性计算整个 DataFrame 的唯一标识和飞书字段数据
         
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/batch_create"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        未传入 converters 时，结果与逐行调用 _row_unique_key / _build_record_fields 完全一致；
+        传入由表格结构编译的转换器时，字段数据按转换器生成。
         
-        data = {
-            "records": records
+        Returns:
+            tuple: (唯一标识列表, 字段字典列表)
+        """
+        n = len(df)
+        columns = {
+            name: self._column_values(df, name)
+            for name in ['项目名称', '标题', '发布时间', '采购单位', '项目编号', '链接', '采购方式', '省份', '城市']
         }
+        name_mask, name_values = columns['项目名称']
+        title_mask, title_values = columns['标题']
+        date_mask, date_values = columns['发布时间']
+        code_mask, code_values = columns['项目编号']
+        
+        # 唯一标识：规范化的标题+发布时间，缺失时使用项目编号
+        record_title = np.where(name_values != '', name_values, title_values)
+        unique_keys = [
+            dedupe_key(title, publish_date, code)
+            for title, publish_date, code in zip(record_title.tolist(), date_values.tolist(), code_values.tolist())
+        ]
+        
+        if converters is not None:
+            return unique_keys, self._apply_converters(df, converters)
+        
+        # 项目名称：列存在且非空时优先使用"项目名称"（值为空字符串时不回退到"标题"）
+        title_field = np.where(name_mask, name_values, np.where(title_mask, title_values, ''))
+        title_field = np.where(title_field != '', title_field, None)
+        
+        # 发布时间：整列一次性转换，每个不同的日期字符串只解析一次
+        timestamps = np.full(n, None, dtype=object)
+        if date_mask.any():
+            timestamps[date_mask] = [ms or None for ms in dates_to_epoch_ms(date_values[date_mask])]
+        
+        link_mask, link_values = columns['链接']
+        links = np.full(n, None, dtype=object)
+        links[link_mask] = [{"link": value, "text": "查看详情"} for value in link_values[link_mask]]
+        
+        def masked(name):
+            mask, values = columns[name]
+            return np.where(mask, values, None)
+        
+        # 字段顺序与 _build_record_fields 保持一致
+        field_columns = [
+            ('项目名称', title_field),
+            ('发布时间', timestamps),
+            ('采购单位', masked('采购单位')),
+            ('项目编号', masked('项目编号')),
+            ('链接', links),
+            ('采购方式', masked('采购方式')),
+            ('省份', masked('省份')),
+            ('城市', masked('城市')),
+        ]
+        names = [name for name, _ in field_columns]
+        field_payloads = [
+            {name: value for name, value in zip(names, row) if value is not None}
+            for row in zip(*(values.tolist() for _, values in field_columns))
+        ]
+        
+        return unique_keys, field_payloads
+    
+    def _add_batch_records(self, records, unique_keys=None):
+        """
+        批量添加记录到飞书多维表格
+        
+        Args:
+            records: 记录列表 [{"fields": {...}}, ...]
+            unique_keys: 与 records 一一对应的唯一标识，添加成功后写入本地去重索引
+        
+        Returns:
+            tuple: (成功数量, 失败数量)
+        """
+        return self._write_batch('batch_create', records, unique_keys)
+    
+    def _update_batch_records(self, records, unique_keys=None):
+        """
+        批量更新已有记录
+        
+        Args:
+            records: 记录列表 [{"record_id": ..., "fields": {...}}, ...]
+            unique_keys: 与 records 一一对应的唯一标识，更新成功后刷新本地索引中的内容哈希
         
+        Returns:
+            tuple: (成功数量, 失败数量)
+        """
+        return self._write_batch('batch_update', records, unique_keys)
+    
+    def _write_batch(self, action, records, unique_keys=None):
+        """
+        执行一批 batch_create / batch_update
+        
+        临时错误（网络异常、5xx）按指数退避重试；记录内容错误时把批次对半拆分后
+        分别重试，最终只丢弃真正有问题的记录；表格结构错误时整批失败，不拆分。
+        """
+        if not records:
+            return 0, 0
+        
+        verb = '添加' if action == 'batch_create' else '更新'
         if self.debug:
-            print(f"📤 正在批量添加 {len(records)} 条记录...")
+            print(f"📤 正在批量{verb} {len(records)} 条记录...")
         
-        try:
-            response = requests.post(url, headers=headers, data=json.dumps(data))
+        result = self._post_batch(action, records)
+        
+        if result.get("code") == 0:
+            written = result.get("data", {}).get("records", [])
+            success_count = len(written)
+            print(f"✅ 成功{verb} {success_count} 条记录")
             
-            result = response.json()
+            # 返回的记录与请求顺序一致
+            if self.dedupe_index and unique_keys:
+                self.dedupe_index.add_many(
+                    (key, record.get("record_id"), self._content_hash(sent.get("fields", {})))
+                    for key, sent, record in zip(unique_keys, records, written)
+                )
+            return success_count, 0
+        
+        if result.get("code") in SCHEMA_ERROR_CODES:
+            # 字段不存在：表格结构已变化，下次上传前重新获取；拆分批次也不会成功
+            self.invalidate_schema()
+            print(f"❌ 表格结构错误（{result.get('msg')}），本批 {len(records)} 条{verb}失败")
+            return 0, len(records)
+        
+        if self._is_data_error(result) and len(records) > 1:
+            # 数据错误：拆分批次定位有问题的记录
+            mid = len(records) // 2
+            keys = unique_keys or [None] * len(records)
+            print(f"🔍 批次数据错误（{result.get('msg')}），拆分为 {mid} + {len(records) - mid} 条重试")
+            left_success, left_fail = self._write_batch(action, records[:mid], keys[:mid])
+            right_success, right_fail = self._write_batch(action, records[mid:], keys[mid:])
+            return left_success + right_success, left_fail + right_fail
+        
+        if len(records) == 1:
+            print(f"❌ 丢弃无效记录（{result.get('msg')}）: {json.dumps(records[0], ensure_ascii=False)[:200]}")
+        else:
+            print(f"❌ {verb}记录失败: {result.get('msg')}")
+        return 0, len(records)
+    
+    @staticmethod
+    def _is_data_error(result):
+        """是否为记录内容导致的错误（拆分批次可以定位到具体记录）"""
+        code = result.get("code")
+        return code in DATA_ERROR_CODES or (isinstance(code, int) and 1254060 <= code <= 1254069)
+    
+    def _post_batch(self, action, records):
+        """
+        发送一次 batch_create / batch_update 请求，处理限频和临时错误的重试
+        
+        batch_create 的所有重试使用同一个 client_token，服务端据此去重，
+        即使请求已生效但响应丢失，重试也不会产生重复记录；
+        batch_update 本身是幂等的（重复写入相同字段值），不带 client_token。
+        
+        Returns:
+            dict: 最后一次响应的 JSON（网络异常时为 {"code": -1, "msg": ...}）
+        """
+        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/{action}"
+        params = {"client_token": str(uuid.uuid4())} if action == 'batch_create' else None
+        body = json.dumps({"records": records})
+        
+        rate_limit_retries = 0
+        transient_retries = 0
+        token_refreshed = False
+        while True:
+            token = self.access_token
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            }
+            self.upload_limiter.acquire()
+            started = time.monotonic()
+            response = None
+            try:
+                response = self.session.post(url, params=params, headers=headers, data=body)
+                try:
+                    result = response.json()
+                except ValueError:
+                    result = {"code": -1, "msg": f"HTTP {response.status_code}"}
+            except Exception as e:
+                self.upload_limiter.record(timeout=True)
+                result = {"code": -1, "msg": f"添加记录异常: {e}"}
             
-            if result.get("code") == 0:
-                success_count = len(result.get("data", {}).get("records", []))
-                print(f"✅ 成功添加 {success_count} 条记录")
-                return success_count, 0
-            else:
-                print(f"❌ 添加记录失败: {result.get('msg')}")
-                return 0, len(records)
+            if response is not None:
+                rate_limited = response.status_code == 429 or result.get("code") in RATE_LIMIT_CODES
+                self.upload_limiter.record(
+                    latency=time.monotonic() - started,
+                    status_code=429 if rate_limited else response.status_code
+                )
                 
-        except Exception as e:
-            print(f"添加记录异常: {e}")
-            return 0, len(records)
+                if rate_limited:
+                    if rate_limit_retries >= self.max_rate_limit_retries:
+                        return result
+                    rate_limit_retries += 1
+                    # 触发限频：按服务端要求暂停所有上传线程后重试
+                    wait = self._retry_after(response)
+                    print(f"⏳ 触发飞书限频（{result.get('code')}），{wait:.1f} 秒后重试...")
+                    self.upload_limiter.pause(wait)
+                    continue
+                
+                if result.get("code") in TOKEN_ERROR_CODES and not token_refreshed:
+                    # token 在上传过程中失效：刷新一次后重试
+                    token_refreshed = True
+                    self.token_provider.invalidate(token)
+                    self._get_access_token()
+                    continue
+                
+                transient = response.status_code >= 500 or result.get("code") in TRANSIENT_ERROR_CODES
+                if not transient:
+                    return result
+            
+            # 网络异常或服务端临时错误：指数退避后重试
+            if transient_retries >= self.max_retries:
+                return result
+            wait = self.retry_backoff * (2 ** transient_retries) * (1 + random.random() * 0.5)
+            transient_retries += 1
+            print(f"⚠️  批量写入临时失败（{result.get('msg')}），{wait:.1f} 秒后第 {transient_retries} 次重试...")
+            time.sleep(wait)
     
     def list_table_fields(self):
         """列出表格的所有字段（列名）"""
@@ -335,7 +1104,7 @@ class FeishuBitableWriter:
         }
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             result = response.json()
             
             if result.get("code") == 0:
@@ -360,37 +1129,10 @@ class FeishuBitableWriter:
             print("无法获取有效的 access token")
             return None
         
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
         all_records = []
-        page_token = ""
-        page_size = 500
-        
         try:
-            while True:
-                params = {"page_size": page_size}
-                if page_token:
-                    params["page_token"] = page_token
-                
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-                result = response.json()
-                
-                if result.get("code") == 0:
-                    data = result.get("data", {})
-                    items = data.get("items", [])
-                    all_records.extend(items)
-                    
-                    page_token = data.get("page_token", "")
-                    if not page_token:
-                        break
-                else:
-                    print(f"获取记录失败: {result}")
-                    break
-                    
+            for record in self._iter_records():
+                all_records.append(record)
         except Exception as e:
             print(f"获取记录异常: {e}")
         
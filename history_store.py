@@ -0,0 +1,308 @@
+# history_store.py - 历史公告全文检索库（SQLite FTS5）
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from dedupe_keys import item_key
+
+# HISTORY_DB 为空时同样使用默认路径（.env.example 中该项留空）
+DEFAULT_HISTORY_FILE = os.getenv('HISTORY_DB') or os.path.join(
+    os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'history.sqlite3'
+)
+
+# 记录字段 -> 数据库列
+COLUMNS = {
+    '标题': 'title',
+    '发布时间': 'publish_date',
+    '采购单位': 'purchaser',
+    '项目编号': 'project_code',
+    '采购方式': 'purchase_mode',
+    '省份': 'province',
+    '城市': 'city',
+    '分类': 'category',
+    '链接': 'url',
+    '来源网站': 'site',
+    '全文': 'body',
+}
+
+# 参与全文检索的列（地区 = 省份 + 城市）
+FTS_COLUMNS = ['title', 'purchaser', 'project_code', 'region', 'body']
+
+# trigram 分词按 3 个字符切分，短于 3 个字符的检索词只能逐行匹配
+_TRIGRAM_MIN_LENGTH = 3
+
+# SQLite 单条语句的参数个数有上限，批量写入时分块
+_CHUNK_SIZE = 500
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+class HistoryStore:
+    """
+    爬虫提取的每条公告（含完整正文）保存在本地 SQLite 中，
+    按规范化的去重标识（dedupe_keys.item_key，含来源网站）去重。
+
+    标题、采购单位、项目编号、地区和正文建立 FTS5 全文索引（trigram 分词，
+    中文任意子串都能检索），查询时按相关度排序，并可按发布日期和来源网站过滤，
+    不需要重新爬取。SQLite 不支持 FTS5 trigram 时退回逐行 LIKE 匹配。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_HISTORY_FILE
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            legacy = self._is_legacy_schema()
+            if legacy:
+                self._conn.execute("ALTER TABLE announcements RENAME TO announcements_legacy")
+                self._conn.execute("DROP TABLE IF EXISTS announcements_fts")
+                self._conn.execute("DROP INDEX IF EXISTS idx_announcements_date")
+                self._conn.execute("DROP INDEX IF EXISTS idx_announcements_site")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS announcements ("
+                " id INTEGER PRIMARY KEY,"
+                " unique_key TEXT NOT NULL UNIQUE,"
+                " title TEXT NOT NULL,"
+                " publish_date TEXT NOT NULL,"
+                " site TEXT NOT NULL,"
+                " purchaser TEXT, project_code TEXT, purchase_mode TEXT,"
+                " province TEXT, city TEXT, category TEXT, url TEXT, body TEXT,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_announcements_date ON announcements (publish_date)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_announcements_site ON announcements (site)")
+        self.fts = self._create_fts()
+        if legacy:
+            self._migrate_legacy()
+
+    def _is_legacy_schema(self):
+        """旧版本按原始 标题+发布时间+来源网站 去重，没有 unique_key 列"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(announcements)")}
+        return bool(columns) and 'unique_key' not in columns
+
+    def _migrate_legacy(self):
+        """将旧表的记录按规范化的去重标识重新写入（仅空白、全角不同的记录合并为一条）"""
+        columns = list(COLUMNS.values())
+        rows = self._conn.execute(f"SELECT {', '.join(columns)} FROM announcements_legacy ORDER BY updated_at").fetchall()
+        fields = {column: field for field, column in COLUMNS.items()}
+        self.add_many({fields[column]: row[column] for column in columns} for row in rows)
+        with self._conn:
+            self._conn.execute("DROP TABLE announcements_legacy")
+        print(f"📚 历史检索库已按规范化去重标识迁移：{len(rows)} 条 -> {self.count()} 条")
+
+    def _create_fts(self):
+        try:
+            with self._conn:
+                self._conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS announcements_fts"
+                    f" USING fts5({', '.join(FTS_COLUMNS)}, tokenize='trigram')"
+                )
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  当前 SQLite 不支持 FTS5 trigram 分词（{e}），检索将逐行匹配")
+            return False
+
+    # ---- 写入 ----
+
+    def add_many(self, rows):
+        """
+        写入提取后的记录（已存在的记录更新内容）
+
+        Args:
+            rows: 记录字典列表，字段同 extract_item_fields，另含"来源网站"和"全文"
+
+        Returns:
+            int: 写入的条数
+        """
+        # 同一批中去重标识相同的记录只保留最后一条
+        values = {}
+        for row in rows:
+            item = {column: _text(row.get(field)) for field, column in COLUMNS.items()}
+            if item['title']:
+                item['unique_key'] = item_key(row, with_site=True)
+                values[item['unique_key']] = item
+        values = list(values.values())
+        if not values:
+            return 0
+
+        now = time.time()
+        columns = ['unique_key'] + list(COLUMNS.values())
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns[1:])
+        with self._lock, self._conn:
+            for i in range(0, len(values), _CHUNK_SIZE):
+                chunk = values[i:i + _CHUNK_SIZE]
+                self._conn.executemany(
+                    f"INSERT INTO announcements ({', '.join(columns)}, updated_at)"
+                    f" VALUES ({', '.join('?' * len(columns))}, ?)"
+                    f" ON CONFLICT (unique_key) DO UPDATE SET {updates}, updated_at = excluded.updated_at",
+                    [[item[column] for column in columns] + [now] for item in chunk]
+                )
+                if self.fts:
+                    self._index(chunk)
+        return len(values)
+
+    def _index(self, items):
+        """在事务内调用：重建这些记录的全文索引条目（rowid 与 announcements.id 相同）"""
+        ids = []
+        for item in items:
+            row = self._conn.execute(
+                "SELECT id FROM announcements WHERE unique_key = ?", (item['unique_key'],)
+            ).fetchone()
+            ids.append(row[0])
+        self._conn.executemany("DELETE FROM announcements_fts WHERE rowid = ?", [(rowid,) for rowid in ids])
+        self._conn.executemany(
+            f"INSERT INTO announcements_fts (rowid, {', '.join(FTS_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (rowid, item['title'], item['purchaser'], item['project_code'],
+                 f"{item['province']} {item['city']}".strip(), item['body'])
+                for rowid, item in zip(ids, items)
+            ]
+        )
+
+    # ---- 查询 ----
+
+    def search(self, query, start=None, end=None, sites=None, limit=20):
+        """
+        全文检索，多个检索词（空格分隔）需同时命中
+
+        Args:
+            query: 检索词，如 "天安 皮带机"
+            start / end: 发布日期范围 'YYYY-MM-DD'，None 表示不限
+            sites: 只检索这些来源网站
+            limit: 最多返回条数
+
+        Returns:
+            list: 记录字典（按相关度排序，相关度相同时按发布时间倒序），含"摘要"字段
+        """
+        terms = [term for term in (query or '').split() if term]
+        conditions = []
+        params = []
+
+        # 3 个字符及以上的检索词走全文索引，较短的检索词逐行匹配
+        match_terms = [term for term in terms if self.fts and len(term) >= _TRIGRAM_MIN_LENGTH]
+        like_terms = [term for term in terms if term not in match_terms]
+        for term in like_terms:
+            pattern = f"%{term}%"
+            conditions.append(
+                "(a.title LIKE ? OR a.purchaser LIKE ? OR a.project_code LIKE ?"
+                " OR a.province LIKE ? OR a.city LIKE ? OR a.body LIKE ?)"
+            )
+            params.extend([pattern] * 6)
+
+        if start:
+            conditions.append("a.publish_date >= ?")
+            params.append(str(start)[:10])
+        if end:
+            conditions.append("a.publish_date <= ?")
+            params.append(str(end)[:10])
+        if sites:
+            sites = list(sites)
+            conditions.append(f"a.site IN ({', '.join('?' * len(sites))})")
+            params.extend(sites)
+
+        if match_terms:
+            expression = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in match_terms)
+            sql = (
+                "SELECT a.*, bm25(announcements_fts) AS score FROM announcements_fts"
+                " JOIN announcements a ON a.id = announcements_fts.rowid"
+                " WHERE announcements_fts MATCH ?"
+            )
+            params.insert(0, expression)
+            order = "score, a.publish_date DESC"
+        else:
+            sql = "SELECT a.*, 0 AS score FROM announcements a WHERE 1 = 1"
+            order = "a.publish_date DESC"
+        for condition in conditions:
+            sql += f" AND {condition}"
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        fields = {column: field for field, column in COLUMNS.items()}
+        results = []
+        for row in rows:
+            item = {fields[column]: row[column] for column in COLUMNS.values()}
+            item['摘要'] = self._snippet(row['body'], terms)
+            results.append(item)
+        return results
+
+    @staticmethod
+    def _snippet(body, terms, width=40):
+        """正文中第一个命中检索词的位置前后各 width 个字符"""
+        body = (body or '').replace('\n', ' ')
+        for term in terms:
+            position = body.find(term)
+            if position >= 0:
+                begin = max(0, position - width)
+                end = position + len(term) + width
+                return f"{'...' if begin else ''}{body[begin:end]}{'...' if end < len(body) else ''}"
+        return body[:width * 2] + ('...' if len(body) > width * 2 else '')
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM announcements").fetchone()[0]
+
+    def stats(self):
+        """各来源网站的记录数和发布日期范围"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT site, COUNT(*), MIN(publish_date), MAX(publish_date)"
+                " FROM announcements GROUP BY site ORDER BY site"
+            ).fetchall()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='晋能控股招标数据 - 历史公告全文检索')
+    parser.add_argument('--db', help='检索库路径（默认 HISTORY_DB 或 .crawler_cache/history.sqlite3）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('search', help='检索公告')
+    search_parser.add_argument('query', nargs='+', help='检索词（多个检索词需同时命中）')
+    search_parser.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    search_parser.add_argument('--end', help='结束日期 YYYY-MM-DD')
+    search_parser.add_argument('--site', action='append', help='只检索指定来源网站（可重复）')
+    search_parser.add_argument('--limit', type=int, default=20, help='最多返回条数（默认 20）')
+
+    subparsers.add_parser('stats', help='查看各来源网站的记录数')
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+
+    if args.command == 'search':
+        started = time.perf_counter()
+        results = store.search(' '.join(args.query), args.start, args.end, args.site, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"🔍 共 {len(results)} 条结果，耗时 {elapsed:.1f} ms\n")
+        for i, item in enumerate(results, 1):
+            print(f"{i}. [{item['发布时间']}] {item['标题']}")
+            print(f"   采购单位: {item['采购单位']}  项目编号: {item['项目编号']}  来源: {item['来源网站']}")
+            if item['链接']:
+                print(f"   链接: {item['链接']}")
+            if item['摘要']:
+                print(f"   摘要: {item['摘要']}")
+    elif args.command == 'stats':
+        print(f"📚 共 {store.count()} 条记录")
+        for site, (count, first, last) in store.stats().items():
+            print(f"   {site}: {count} 条，{first} 至 {last}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# http_client.py - 共享HTTP传输层
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# 默认超时：(连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (10, 30)
+
+# 每个主机连接池的最大连接数，需不小于爬虫并发数
+DEFAULT_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+
+# 爬虫代理地址（仅在GitHub Actions环境中启用）
+DEFAULT_PROXY_URL = os.getenv('SPIDER_PROXY_URL', 'http://117.69.236.166:8089')
+
+
+class PooledSession(requests.Session):
+    """带连接池、keep-alive、gzip 和默认超时的 Session"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        super().__init__()
+        self.default_timeout = timeout
+
+        # 每个主机一个连接池，连接在请求间复用
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+        self.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+
+    def request(self, method, url, **kwargs):
+        # 调用方未指定超时时使用默认值，避免请求无限挂起
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        return super().request(method, url, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """获取进程内共享的 Session（爬虫、飞书写入器、通知器共用）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = PooledSession()
+    return _session
+
+
+def use_proxy():
+    """是否需要为爬虫请求启用代理（GitHub Actions环境中自动启用）"""
+    return os.getenv('GITHUB_ACTIONS') == 'true'
+
+
+def get_proxy_config(proxy_url=None):
+    """构建 requests 使用的代理配置"""
+    proxy_url = proxy_url or DEFAULT_PROXY_URL
+    return {
+        'http': proxy_url,
+        'https': proxy_url
+    }
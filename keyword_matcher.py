@@ -0,0 +1,76 @@
+# keyword_matcher.py - 多关键词本地匹配（Aho-Corasick 自动机）
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    将关键词列表编译为 Aho-Corasick 自动机，一次扫描文本即可找出所有命中的关键词。
+    扫描耗时只与文本长度有关，与关键词数量无关。
+    """
+
+    def __init__(self, keywords):
+        # 去重并保持原有顺序，匹配结果按此顺序返回
+        self.keywords = [k for k in dict.fromkeys(keywords) if k]
+        self._order = {k: i for i, k in enumerate(self.keywords)}
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        for keyword in self.keywords:
+            self._add(keyword)
+        self._build_fail_links()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword.lower():
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(keyword)
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # 继承失败链上的输出（后缀关键词）
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """返回文本中出现的所有关键词（按关键词列表顺序）"""
+        if not text or not self.keywords:
+            return []
+
+        found = set()
+        state = 0
+        for char in str(text).lower():
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return sorted(found, key=self._order.__getitem__)
+
+    def match_item(self, item, fields):
+        """
+        对一条记录的多个字段做匹配
+
+        Returns:
+            dict: {关键词: [命中的字段, ...]}，按关键词顺序排列
+        """
+        matches = {}
+        for field in fields:
+            for keyword in self.find(item.get(field)):
+                matches.setdefault(keyword, []).append(field)
+        return {k: matches[k] for k in sorted(matches, key=self._order.__getitem__)}
@@ -12,6 +12,9 @@ try:
     from spider_core import JnkgBiddingSpider
     from feishu_writer import FeishuBitableWriter
     from feishu_notifier import FeishuNotifier
+    from pipeline import StreamingPipeline
+    from feishu_router import RoutingWriter, load_routes_config
+    from archive import open_archive
 except ImportError as e:
     print(f"导入模块失败，请确保相关.py文件在当前目录: {e}")
     sys.exit(1)
@@ -46,6 +49,54 @@ def get_feishu_config():
     print(f"   Webhook URL: {'已设置' if config['webhook_url'] else '未设置'}")
     
     return config
+
+def create_writer(feishu_config, debug=False):
+    """配置了 FEISHU_ROUTES 时按规则分表写入，否则写入单个表格"""
+    routes_config = load_routes_config()
+    if routes_config:
+        print(f"🔀 按路由规则分表写入: {len(routes_config.get('routes', []))} 条规则")
+        return RoutingWriter.from_config(feishu_config, routes_config, debug=debug)
+    return FeishuBitableWriter(
+        app_id=feishu_config['app_id'],
+        app_secret=feishu_config['app_secret'],
+        app_token=feishu_config['app_token'],
+        table_id=feishu_config['table_id'],
+        debug=debug
+    )
+
+def backup_data(df, prefix=''):
+    """本地备份：追加到 Parquet 归档（只写入未归档过的记录）；归档不可用时保存为带时间戳的 CSV"""
+    archive = open_archive()
+    if archive:
+        written = archive.append(df)
+        print(f"📁 数据已归档至: {archive.root}（新增 {written} 条，其余 {len(df) - written} 条已归档过）")
+        return archive.root
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_file = f"{prefix}晋能控股招标_{timestamp}.csv"
+    df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+    print(f"📁 数据已备份至本地文件: {csv_file}")
+    return csv_file
+
+def send_error_notification(feishu_config, error):
+    """任务出错时发送飞书机器人提醒（如果配置了webhook）"""
+    if not (feishu_config and feishu_config.get('webhook_url')):
+        return
+    try:
+        notifier = FeishuNotifier(feishu_config['webhook_url'])
+        error_msg = f"❌ 招标数据抓取任务失败\n\n错误时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n错误详情: {str(error)}"
+        notifier.send_text(error_msg)
+        print("✅ 错误通知已发送至飞书。")
+    except Exception as notify_error:
+        print(f"❌ 发送错误通知也失败了: {notify_error}")
+
+def create_spider():
+    """分表写入时保留来源网站字段，供按来源路由"""
+    spider = JnkgBiddingSpider()
+    if os.getenv('FEISHU_ROUTES'):
+        spider.keep_source_field = True
+    return spider
+
 # 在main.py中添加代理测试函数
 def test_network_connectivity():
     """测试网络连通性"""
@@ -56,13 +107,14 @@ def test_network_connectivity():
     print(f"GitHub Actions环境: {is_github}")
     
     if is_github:
-        print("🌐 检测到GitHub Actions环境，将启用代理")
-        print("代理地址: http://113.121.39.222:9999")
+        from proxy_pool import DEFAULT_PROXY_URLS
+        print("🌐 检测到GitHub Actions环境，将启用代理池")
+        print(f"候选代理: {', '.join(DEFAULT_PROXY_URLS)}")
     
     # 导入代理测试
     try:
-        from proxy_test import test_proxy
-        test_proxy()
+        from proxy_test import run_proxy_probe
+        run_proxy_probe()
     except ImportError:
         print("⚠️  代理测试模块未找到，跳过测试")
 
@@ -77,6 +129,65 @@ def run_full_process(days_limit=10):
     # 网络测试
     test_network_connectivity()
 
+def run_streaming_process(days_limit=10):
+    """流式的抓取和上传流程：边抓取边上传，内存占用不随数据量增长"""
+    print("\n🔍 流式模式: 抓取与上传同时进行...")
+    spider = create_spider()
+    feishu_config = get_feishu_config()
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if feishu_config:
+        csv_file = f"晋能控股招标_{timestamp}.csv"
+    else:
+        print("由于飞书配置不全，跳过上传步骤，仅本地备份。")
+        csv_file = f"本地备份_晋能控股招标_{timestamp}.csv"
+    
+    # 有 Parquet 归档时不再生成每次运行的 CSV
+    archive = open_archive()
+    if archive:
+        csv_file = None
+    
+    pipeline = None
+    try:
+        writer = create_writer(feishu_config) if feishu_config else None
+        pipeline = StreamingPipeline(spider, writer, backup_csv=csv_file, archive=archive)
+        stats = pipeline.run(days_limit)
+    except Exception as e:
+        # 每批数据在上传前已写入归档/CSV 备份，出错前抓取的数据不会丢失；不推进增量高水位
+        total = pipeline.stats['total'] if pipeline else 0
+        print(f"❌ 流式抓取上传过程中发生错误: {e}")
+        if total:
+            print(f"📁 出错前已处理的 {total} 条数据已备份至: {archive.root if archive else csv_file}")
+        send_error_notification(feishu_config, e)
+        return False, total, 0, 0
+    
+    print("\n📊 上传结果汇总:")
+    print(f"   抓取数据: {stats['total']} 条")
+    print(f"   成功新增: {stats['success']} 条")
+    print(f"   重复跳过: {stats['duplicate']} 条")
+    print(f"   添加失败: {stats['fail']} 条")
+    if isinstance(writer, RoutingWriter):
+        writer.print_summary()
+    if stats['total']:
+        print(f"📁 数据已备份至: {archive.root if archive else csv_file}")
+    
+    if stats['fail'] == 0:
+        spider.commit_crawl_state()
+    
+    if feishu_config and feishu_config.get('webhook_url'):
+        try:
+            notifier = FeishuNotifier(feishu_config['webhook_url'])
+            notifier.send_crawler_report_with_card(
+                total_count=stats['total'],
+                success_count=stats['success'],
+                duplicate_count=stats['duplicate'],
+                fail_count=stats['fail']
+            )
+        except Exception as e:
+            print(f"❌ 发送飞书机器人提醒时出错: {e}")
+    
+    return True, stats['total'], stats['success'], stats['duplicate']
+
 def run_full_process(days_limit=10):
     """完整的抓取和上传流程"""
     print("="*60)
@@ -84,9 +195,13 @@ def run_full_process(days_limit=10):
     print(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*60)
     
+    # PIPELINE_MODE=stream 时使用流式流水线
+    if os.getenv('PIPELINE_MODE', 'batch') == 'stream':
+        return run_streaming_process(days_limit)
+    
     # 1. 初始化爬虫并抓取数据
     print("\n🔍 步骤1: 开始抓取招标数据...")
-    spider = JnkgBiddingSpider()
+    spider = create_spider()
     
     # 使用新的多网站搜索方法
     all_data = spider.search_all_websites(days_limit=days_limit)
@@ -112,22 +227,14 @@ def run_full_process(days_limit=10):
     
     if not feishu_config:
         print("由于飞书配置不全，跳过上传步骤。")
-        # 本地保存一份CSV作为备份
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_file = f"本地备份_晋能控股招标_{timestamp}.csv"
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        print(f"数据已本地备份至: {csv_file}")
+        # 本地备份
+        backup_data(df, prefix='本地备份_')
+        spider.commit_crawl_state()
         return True, len(df), 0, 0
     
     try:
         # 初始化飞书写入器
-        writer = FeishuBitableWriter(
-            app_id=feishu_config['app_id'],
-            app_secret=feishu_config['app_secret'],
-            app_token=feishu_config['app_token'],
-            table_id=feishu_config['table_id'],
-            debug=True
-        )
+        writer = create_writer(feishu_config, debug=True)
         
         # 上传数据，使用'项目编号'作为去重依据
         success, fail, duplicate = writer.add_records(df, unique_key_field='项目编号')
@@ -136,12 +243,15 @@ def run_full_process(days_limit=10):
         print(f"   成功新增: {success} 条")
         print(f"   重复跳过: {duplicate} 条")
         print(f"   添加失败: {fail} 条")
+        if isinstance(writer, RoutingWriter):
+            writer.print_summary()
         
-        # 3. 本地也保存一份CSV作为备份
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_file = f"晋能控股招标_{timestamp}.csv"
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        print(f"📁 数据已备份至本地文件: {csv_file}")
+        # 上传完成后推进增量爬取高水位（有失败记录时不推进，下次重新抓取）
+        if fail == 0:
+            spider.commit_crawl_state()
+        
+        # 3. 本地也保存一份备份
+        backup_data(df)
         
         # 4. 发送飞书机器人提醒（如果配置了webhook）
         if feishu_config.get('webhook_url'):
@@ -180,20 +290,10 @@ def run_full_process(days_limit=10):
     except Exception as e:
         print(f"❌ 上传到飞书过程中发生错误: {e}")
         # 出错时也保存本地备份
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_file = f"错误备份_晋能控股招标_{timestamp}.csv"
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        print(f"数据已保存至本地备份文件: {csv_file}")
+        backup_data(df, prefix='错误备份_')
         
         # 错误时也发送提醒（如果配置了webhook）
-        if feishu_config and feishu_config.get('webhook_url'):
-            try:
-                notifier = FeishuNotifier(feishu_config['webhook_url'])
-                error_msg = f"❌ 招标数据抓取任务失败\n\n错误时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n错误详情: {str(e)}"
-                notifier.send_text(error_msg)
-                print("✅ 错误通知已发送至飞书。")
-            except Exception as notify_error:
-                print(f"❌ 发送错误通知也失败了: {notify_error}")
+        send_error_notification(feishu_config, e)
             
         return False, len(df), 0, 0
 
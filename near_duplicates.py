@@ -0,0 +1,229 @@
+# near_duplicates.py - 基于 SimHash + LSH 的相似公告检测
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+
+import numpy as np
+
+from dedupe_keys import fingerprint, normalize_date, normalize_text
+
+DEFAULT_NEAR_DUP_FILE = os.path.join(os.getenv('CRAWLER_CACHE_DIR', '.crawler_cache'), 'near_duplicates.sqlite3')
+
+# 输出记录中的相似公告分组列
+GROUP_FIELD = '相似公告'
+
+# 重发、变更类公告标题中的附加说明及"公告""通知"字样，计算签名前去掉
+_REPOST_PATTERN = re.compile(
+    r'[(\[]?(第?[一二三四五六七八九十\d]+次|二次|再次|重新|重发)[)\]]?'
+    r'|变更|更正|澄清|补充|延期|公告|通知'
+)
+
+# 签名分为 5 段（13/13/13/13/12 位），海明距离不超过 4 的两个签名至少有一段完全相同
+_BAND_WIDTHS = [13, 13, 13, 13, 12]
+_BAND_OFFSETS = [sum(_BAND_WIDTHS[:i]) for i in range(len(_BAND_WIDTHS))]
+_BANDS = len(_BAND_WIDTHS)
+
+# 标题的片段权重高于正文
+_TITLE_WEIGHT = 3
+_TEXT_LENGTH = 1000
+
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+_MASK_64 = (1 << 64) - 1
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _shingles(text, size=2):
+    if len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(len(text) - size + 1)]
+
+
+def normalize_title(title):
+    """规范化标题并去掉（二次）、变更公告 等重发说明"""
+    return _REPOST_PATTERN.sub('', normalize_text(title))
+
+
+def simhash(title, text=''):
+    """
+    由规范化后的标题和正文（前 1000 字）的二元字片段计算 64 位 SimHash
+
+    Returns:
+        int: 无符号 64 位签名
+    """
+    weights = {}
+    for shingle in _shingles(normalize_title(title)):
+        weights[shingle] = weights.get(shingle, 0) + _TITLE_WEIGHT
+    for shingle in _shingles(normalize_text(text)[:_TEXT_LENGTH]):
+        weights[shingle] = weights.get(shingle, 0) + 1
+    if not weights:
+        return 0
+
+    hashes = np.fromiter((_shingle_hash(shingle) for shingle in weights), dtype=np.uint64, count=len(weights))
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int64)
+    vector = np.asarray(list(weights.values()), dtype=np.int64) @ (bits * 2 - 1)
+    # 用 Python 整数拼接，避免 numpy 有符号整数在第 63 位溢出
+    return sum(1 << int(i) for i in np.flatnonzero(vector > 0))
+
+
+def hamming_distance(a, b):
+    """两个 64 位签名的海明距离（先截断为无符号 64 位）"""
+    return bin((int(a) & _MASK_64) ^ (int(b) & _MASK_64)).count('1')
+
+
+def group_id_for(key):
+    """以某条公告为首条记录的分组编号"""
+    return f"{fingerprint(key):016x}"
+
+
+def _signed(value):
+    """SQLite 整数为有符号 64 位，签名按补码存储（读取后由 hamming_distance 截断还原）"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(normalize_date(value))
+    except ValueError:
+        return None
+
+
+class NearDuplicateIndex:
+    """
+    历史公告的 SimHash 签名与 LSH 分段索引（SQLite 持久化）。
+
+    新公告只与至少有一段签名完全相同的历史公告比较（按段索引查询，不扫描全部历史），
+    海明距离不超过 max_distance 且发布时间相差不超过 max_days 天的视为相似，
+    归入最接近的那条公告所在的分组；没有相似公告时自成一组，
+    分组编号由首条公告的去重标识得到（见 group_id_for）。
+    """
+
+    def __init__(self, path=None, max_distance=None, max_days=None):
+        self.path = path or DEFAULT_NEAR_DUP_FILE
+        self.max_distance = max_distance if max_distance is not None else int(os.getenv('NEAR_DUP_DISTANCE', '4'))
+        self.max_days = max_days if max_days is not None else int(os.getenv('NEAR_DUP_DAYS', '60'))
+        if self.max_distance >= _BANDS:
+            print(f"⚠️  相似公告海明距离阈值 {self.max_distance} 超过分段索引的保证范围，部分相似公告可能漏检")
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                " unique_key TEXT PRIMARY KEY,"
+                " simhash INTEGER NOT NULL,"
+                " group_id TEXT NOT NULL,"
+                " publish_date TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS signature_bands ("
+                " band INTEGER NOT NULL,"
+                " value INTEGER NOT NULL,"
+                " unique_key TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_signature_bands ON signature_bands (band, value)"
+            )
+
+    @staticmethod
+    def _bands(signature):
+        return [
+            (band, (signature >> offset) & ((1 << width) - 1))
+            for band, (offset, width) in enumerate(zip(_BAND_OFFSETS, _BAND_WIDTHS))
+        ]
+
+    def _candidates(self, signature):
+        """在事务内调用：与 signature 至少有一段相同的历史公告"""
+        clauses = ' OR '.join(['(band = ? AND value = ?)'] * _BANDS)
+        params = [value for pair in self._bands(signature) for value in pair]
+        return self._conn.execute(
+            "SELECT unique_key, simhash, group_id, publish_date FROM signatures WHERE unique_key IN"
+            f" (SELECT unique_key FROM signature_bands WHERE {clauses})",
+            params
+        ).fetchall()
+
+    def _match(self, signature, publish_date):
+        """最接近的相似公告的分组编号，没有时返回 None"""
+        day = _parse_day(publish_date)
+        best = None
+        for _, candidate, group_id, candidate_date in self._candidates(signature):
+            distance = hamming_distance(signature, candidate)
+            if distance > self.max_distance:
+                continue
+            candidate_day = _parse_day(candidate_date)
+            if day and candidate_day and abs((day - candidate_day).days) > self.max_days:
+                continue
+            if best is None or (distance, candidate_date or '') < best[:2]:
+                best = (distance, candidate_date or '', group_id)
+        return best[2] if best else None
+
+    def assign_many(self, items):
+        """
+        为一批公告分配相似公告分组（同一批中靠后的公告也会与靠前的比较）
+
+        Args:
+            items: [(去重标识, 标题, 发布时间, 正文), ...]
+
+        Returns:
+            list: 与 items 对应的分组编号
+        """
+        groups = []
+        with self._lock, self._conn:
+            for key, title, publish_date, text in items:
+                row = self._conn.execute(
+                    "SELECT group_id FROM signatures WHERE unique_key = ?", (key,)
+                ).fetchone()
+                if row:
+                    groups.append(row[0])
+                    continue
+
+                signature = simhash(title, text)
+                group_id = self._match(signature, publish_date) or group_id_for(key)
+                self._conn.execute(
+                    "INSERT INTO signatures (unique_key, simhash, group_id, publish_date) VALUES (?, ?, ?, ?)",
+                    (key, _signed(signature), group_id, normalize_date(publish_date))
+                )
+                self._conn.executemany(
+                    "INSERT INTO signature_bands (band, value, unique_key) VALUES (?, ?, ?)",
+                    [(band, value, key) for band, value in self._bands(signature)]
+                )
+                groups.append(group_id)
+        return groups
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def collapse_similar(df, key_func):
+    """
+    每个相似公告分组只保留首条公告：去掉分组编号不是以自身为首条的记录
+    （历史中已有同组公告的重发），以及同一批中同组的后续记录
+
+    Args:
+        df: 含"相似公告"列的 DataFrame（没有该列时原样返回）
+        key_func: 行字典 -> 去重标识
+
+    Returns:
+        tuple: (保留的 DataFrame, 去掉的条数)
+    """
+    if GROUP_FIELD not in df.columns or df.empty:
+        return df, 0
+    own_groups = [group_id_for(key_func(row)) for row in df.to_dict('records')]
+    groups = df[GROUP_FIELD]
+    keep = (groups.isna() | ((groups == own_groups) & ~groups.duplicated())).to_numpy()
+    return df[keep], int((~keep).sum())
@@ -0,0 +1,132 @@
+# pipeline.py - 流式 抓取 -> 转换 -> 上传 流水线
+import os
+import queue
+import threading
+
+import pandas as pd
+
+# 队列结束标记
+_END = object()
+
+# 抓取线程等待队列空位时检查停止标记的间隔（秒）
+_PUT_INTERVAL = 0.5
+
+
+class StreamingPipeline:
+    """
+    抓取与上传并行的流水线：
+
+        iter_search_results（分页查询 -> 字段提取 -> 去重）
+            -> 按 batch_size 分批 -> 有界队列 -> batch_create 上传
+
+    抓取线程把记录攒成批放入有界队列，队列满时阻塞（背压），
+    上传线程逐批取出上传。内存中最多保留 queue_size 个批次，不随总数据量增长。
+    每批数据同时追加到本地 Parquet 归档（archive）或 CSV 备份（backup_csv）。
+    
+    上传线程出错时设置停止标记并清空队列，抓取线程随即退出，不会阻塞在队列上；
+    已处理的计数保留在 stats 中。
+    """
+
+    def __init__(self, spider, writer=None, batch_size=100, queue_size=4, backup_csv=None, archive=None):
+        self.spider = spider
+        self.writer = writer
+        self.batch_size = batch_size
+        self.backup_csv = backup_csv
+        self.archive = archive
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._producer_error = None
+        self.stats = {'total': 0, 'success': 0, 'fail': 0, 'duplicate': 0}
+
+    def _put(self, item):
+        """放入队列，队列满时等待；已停止时放弃并返回 False"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=_PUT_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, days_limit):
+        """抓取线程：边抓取边分批放入队列"""
+        batch = []
+        try:
+            for row in self.spider.iter_search_results(days_limit):
+                if self._stop.is_set():
+                    return
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    if not self._put(batch):
+                        return
+                    batch = []
+            if batch:
+                self._put(batch)
+        except Exception as e:
+            self._producer_error = e
+        finally:
+            self._put(_END)
+
+    def _drain(self):
+        """清空队列，释放阻塞在队列上的抓取线程"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _backup(self, batch):
+        """追加写入本地CSV备份"""
+        write_header = not os.path.exists(self.backup_csv)
+        pd.DataFrame(batch).to_csv(self.backup_csv, mode='a', header=write_header, index=False, encoding='utf-8-sig')
+
+    def run(self, days_limit=10):
+        """
+        执行流水线
+
+        Returns:
+            dict: {'total': 抓取条数, 'success': 成功, 'fail': 失败, 'duplicate': 重复}
+        
+        Raises:
+            抓取或上传过程中的异常（此时 stats 为出错前的计数）
+        """
+        stats = self.stats
+
+        # 没有本地去重索引时，只在开始时扫描一次表格，之后各批次共用同一个去重集合
+        existing_keys = None
+        if self.writer and not self.writer.uses_local_index:
+            existing_keys = self.writer.load_existing_keys()
+
+        producer = threading.Thread(target=self._produce, args=(days_limit,), daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is _END:
+                    break
+
+                stats['total'] += len(batch)
+                if self.archive:
+                    self.archive.append(batch)
+                if self.backup_csv:
+                    self._backup(batch)
+
+                if self.writer:
+                    success, fail, duplicate = self.writer.add_records(
+                        pd.DataFrame(batch), unique_key_field='项目编号', existing_keys=existing_keys
+                    )
+                    stats['success'] += success
+                    stats['fail'] += fail
+                    stats['duplicate'] += duplicate
+
+                print(f"📦 已处理 {stats['total']} 条（成功 {stats['success']}，重复 {stats['duplicate']}，失败 {stats['fail']}）")
+        finally:
+            # 正常结束时抓取线程已退出；上传出错时通知抓取线程停止
+            self._stop.set()
+            self._drain()
+            producer.join()
+        if self._producer_error:
+            raise self._producer_error
+
+        return stats
@@ -0,0 +1,133 @@
+# proxy_pool.py - 带健康检查的代理池
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import DEFAULT_PROXY_URL, get_proxy_config, get_session
+
+# 候选代理（逗号分隔，可用 SPIDER_PROXY_URLS 覆盖）
+DEFAULT_PROXY_URLS = [
+    url.strip()
+    for url in os.getenv('SPIDER_PROXY_URLS', f"{DEFAULT_PROXY_URL},http://113.121.39.222:9999").split(',')
+    if url.strip()
+]
+
+# 健康检查使用的地址
+DEFAULT_PROBE_URL = "https://dzzb.jnkgjtdzzbgs.com"
+
+# 直接连接在池中的名称
+DIRECT = 'direct'
+
+
+def is_healthy(status_code):
+    """只有 2xx 视为代理可用（代理的 403/407/429 等同样算失败）"""
+    return 200 <= status_code < 300
+
+
+class ProxyStats:
+    """单个代理的成功率与延迟统计"""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.latency = None  # 指数加权平均延迟（秒）
+
+    def record(self, ok, latency=None):
+        if ok:
+            self.successes += 1
+            if latency is not None:
+                self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+        else:
+            self.failures += 1
+
+    @property
+    def success_rate(self):
+        # 平滑处理，避免单次结果决定排名
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    @property
+    def score(self):
+        """越小越好：平均延迟 / 成功率；没有成功记录的代理排在最后"""
+        if self.latency is None:
+            return float('inf')
+        return self.latency / self.success_rate
+
+
+class ProxyPool:
+    """
+    代理池：并发探测候选代理（以及直接连接），按延迟和成功率排序。
+    请求失败时由调用方按排名依次切换到下一个代理。
+    """
+
+    def __init__(self, proxy_urls=None, include_direct=True, probe_url=DEFAULT_PROBE_URL, probe_timeout=10):
+        self.candidates = list(proxy_urls if proxy_urls is not None else DEFAULT_PROXY_URLS)
+        if include_direct:
+            self.candidates.append(DIRECT)
+        self.probe_url = probe_url
+        self.probe_timeout = probe_timeout
+        self.session = get_session()
+
+        self._stats = {candidate: ProxyStats() for candidate in self.candidates}
+        self._probed = False
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    @staticmethod
+    def proxies_for(candidate):
+        """转换为 requests 的 proxies 参数（直接连接返回 None）"""
+        return None if candidate == DIRECT else get_proxy_config(candidate)
+
+    def _probe_one(self, candidate, url):
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, proxies=self.proxies_for(candidate), timeout=self.probe_timeout)
+            latency = time.monotonic() - started
+            ok = is_healthy(response.status_code)
+            return candidate, ok, latency, response.status_code
+        except Exception as e:
+            return candidate, False, None, str(e)
+
+    def probe(self, url=None):
+        """
+        并发探测所有候选代理
+
+        Returns:
+            list: [(代理, 是否可用, 延迟, 状态码或错误信息), ...]
+        """
+        url = url or self.probe_url
+        with ThreadPoolExecutor(max_workers=len(self.candidates) or 1) as executor:
+            results = list(executor.map(lambda candidate: self._probe_one(candidate, url), self.candidates))
+
+        for candidate, ok, latency, _ in results:
+            self.record(candidate, ok, latency)
+        self._probed = True
+        return results
+
+    def record(self, candidate, ok, latency=None):
+        """记录一次请求结果"""
+        with self._lock:
+            self._stats[candidate].record(ok, latency)
+
+    def ranked(self):
+        """按得分排序的候选列表（首次调用时自动探测）"""
+        if not self._probed:
+            # 并发调用方等待同一次探测完成
+            with self._probe_lock:
+                if not self._probed:
+                    self.probe()
+
+        with self._lock:
+            return sorted(self.candidates, key=lambda candidate: self._stats[candidate].score)
+
+    def best(self):
+        ranked = self.ranked()
+        return ranked[0] if ranked else DIRECT
+
+    def summary(self):
+        """各候选代理的统计信息"""
+        with self._lock:
+            return [
+                (candidate, stats.successes, stats.failures, stats.latency)
+                for candidate, stats in sorted(self._stats.items(), key=lambda item: item[1].score)
+            ]
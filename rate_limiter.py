@@ -0,0 +1,133 @@
+# rate_limiter.py - 自适应限速（令牌桶 + AIMD）
+import threading
+import time
+from urllib.parse import urlparse
+
+# 各主机的限速配置（未列出的主机使用 DEFAULT_RATE_CONFIG）
+#   rate        初始速率（请求/秒）
+#   min_rate    退避下限
+#   max_rate    加速上限
+#   burst       令牌桶容量
+#   latency_target  响应耗时超过该值（秒）视为服务端变慢
+HOST_RATE_CONFIGS = {
+    'dzzb.jnkgjtdzzbgs.com': {
+        'rate': 2.0,
+        'min_rate': 0.2,
+        'max_rate': 10.0,
+        'burst': 4,
+        'latency_target': 3.0,
+    },
+    # 飞书开放平台：多维表格写接口按应用限频 50 次/秒，从较低速率起步逐步加速
+    'open.feishu.cn': {
+        'rate': 10.0,
+        'min_rate': 1.0,
+        'max_rate': 50.0,
+        'burst': 10,
+        'latency_target': 5.0,
+    },
+}
+
+DEFAULT_RATE_CONFIG = {
+    'rate': 5.0,
+    'min_rate': 0.5,
+    'max_rate': 20.0,
+    'burst': 5,
+    'latency_target': 5.0,
+}
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶限速器，速率按 AIMD 规则自适应调整：
+    请求正常且耗时低于目标时速率线性增加；遇到 429/5xx、超时或响应变慢时速率减半。
+    线程安全，可由所有爬取任务共享。
+    """
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=10.0, burst=4,
+                 latency_target=3.0, increase_step=0.2, decrease_factor=0.5):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.burst = max(1, burst)
+        self.latency_target = latency_target
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """服务端要求等待（Retry-After）时，在此之前所有调用方都暂停获取令牌"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # 暂停结束后从空桶开始，避免恢复时瞬间放出一整桶请求
+            self._tokens = 0.0
+            self._last_refill = self._paused_until
+
+    def record(self, latency=None, status_code=None, timeout=False):
+        """
+        根据一次请求的结果调整速率
+
+        Args:
+            latency: 请求耗时（秒）
+            status_code: HTTP 状态码
+            timeout: 是否超时或连接失败
+        """
+        congested = (
+            timeout
+            or status_code == 429
+            or (status_code is not None and status_code >= 500)
+            or (latency is not None and latency > self.latency_target)
+        )
+
+        with self._lock:
+            now = time.monotonic()
+            if congested:
+                # 同一拥塞窗口内并发返回的多个失败只减速一次
+                if now - self._last_decrease < 1.0 / self.rate:
+                    return
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._tokens = min(self._tokens, 0.0)
+                self._last_decrease = now
+            elif status_code is None or status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(url_or_host):
+    """获取某主机共享的限速器（同一进程内同一主机只创建一个）"""
+    host = urlparse(url_or_host).hostname or url_or_host
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            config = HOST_RATE_CONFIGS.get(host, DEFAULT_RATE_CONFIG)
+            limiter = AdaptiveRateLimiter(**config)
+            _limiters[host] = limiter
+        return limiter
@@ -6,6 +6,22 @@ from datetime import datetime, timedelta
 import time
 import logging
 import sys
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from http_client import get_session, use_proxy
+from proxy_pool import ProxyPool, is_healthy
+from keyword_matcher import KeywordMatcher
+from rate_limiter import get_rate_limiter
+from crawl_state import CrawlState
+from day_cache import DayCache, row_day
+from history_store import HistoryStore
+from dedupe_keys import item_key
+from near_duplicates import GROUP_FIELD, NearDuplicateIndex
+from excel_export import export_rows
 
 # 配置日志 - 修复语法错误
 logging.basicConfig(
@@ -50,31 +66,69 @@ class JnkgBiddingSpider:
         self.default_site_id = self.website_configs[0]["site_id"]
         self.default_category_id = self.website_configs[0]["category_id"]
         
+        # 默认分页大小；实际使用的 pageSize 在首次请求前探测并缓存
         self.page_size = 20
+        self.page_size_candidates = [100, 50, 20]
+        self._page_size = None
+        self._page_size_lock = threading.Lock()
+        
+        # 单次查询内并发翻页的线程数上限
+        self.page_workers = int(os.getenv('SPIDER_PAGE_WORKERS', '4'))
         
         # 搜索关键词
         self.keywords = ["天安","晋圣","晋煤"]
         
+        # 每个关键词需要检索的字段：标题、采购单位
+        self.search_fields = ["title", "agentCompanyName"]
+        
+        # 并发配置：同时进行中的查询任务上限（1 表示串行）
+        self.max_workers = int(os.getenv('SPIDER_MAX_WORKERS', '4'))
+        
+        # 查询模式：
+        #   keyword  - 每个关键词、每个字段分别做服务端搜索
+        #   category - 每个栏目的日期窗口只翻页一次（不带关键词），在本地匹配所有关键词
+        self.search_mode = os.getenv('SPIDER_SEARCH_MODE', 'keyword')
+        
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Content-Type': 'application/json; charset=utf-8',
             'Origin': self.base_url,
         }
         
-        # ============【在此处添加代理配置】============
-        # 代理配置
-        self.proxy_config = {
-            'http': 'http://117.69.236.166:8089',
-            'https': 'http://117.69.236.166:8089'
-        }
+        # 共享的连接池会话（与飞书写入器、通知器共用）
+        self.session = get_session()
+        
+        # 按主机共享的自适应限速器，替代固定的 sleep
+        self.rate_limiter = get_rate_limiter(self.base_url)
         
+        # 增量爬取：按 (网站, 栏目, 字段, 关键词) 记录高水位，翻到整页已知记录即停止
+        self.incremental = os.getenv('SPIDER_INCREMENTAL', 'true').lower() == 'true'
+        self.crawl_state = CrawlState()
+        
+        # 日缓存：已结束日期的查询结果按天保存在本地，重叠窗口只请求缺失/未结束的日期
+        self.day_cache = DayCache() if os.getenv('SPIDER_DAY_CACHE', 'true').lower() == 'true' else None
+        
+        # 历史公告全文检索库（保存完整正文，可用 history_store.py 离线检索）
+        self.history_store = HistoryStore() if os.getenv('SPIDER_HISTORY', 'true').lower() == 'true' else None
+        
+        # 相似公告检测：为每条记录标注"相似公告"分组（重发、变更公告归入原公告的分组）
+        self.near_duplicates = NearDuplicateIndex() if os.getenv('SPIDER_NEAR_DUP', 'true').lower() == 'true' else None
+        
+        # 合并结果时保留"来源网站"字段（按来源分表写入时需要）
+        self.keep_source_field = os.getenv('SPIDER_KEEP_SOURCE', 'false').lower() == 'true'
+        
+        # ============【代理配置见 proxy_pool.py】============
         # 检查是否在GitHub Actions环境
         self.is_github_actions = os.getenv('GITHUB_ACTIONS') == 'true'
-        self.use_proxy = self.is_github_actions  # 在GitHub Actions中自动使用代理
+        self.use_proxy = use_proxy()  # 在GitHub Actions中自动使用代理
+        
+        # 代理池：首次请求前并发探测，按延迟和成功率排序，失败时切换下一个（含直接连接）
+        self.proxy_pool = ProxyPool() if self.use_proxy else None
+        self.max_proxy_attempts = 3
         
         if self.use_proxy:
-            print("🌐 检测到GitHub Actions环境，启用代理")
-            print(f"🔗 代理地址: {self.proxy_config['http']}")
+            print("🌐 检测到GitHub Actions环境，启用代理池")
+            print(f"🔗 候选代理: {', '.join(self.proxy_pool.candidates)}")
         # ============【代理配置结束】============
         
         # 显示当前工作目录
@@ -82,155 +136,564 @@ class JnkgBiddingSpider:
         print(f"📂 输出文件将保存在此目录")
         print("="*60)
     
+    def _build_payload(self, page_no, page_size, keyword, search_field, site_id, category_id, start_date, end_date):
+        """构建 queryContentPage 请求体"""
+        payload = {
+            "pageNo": page_no,
+            "pageSize": page_size,
+            "dto": {
+                "siteId": site_id,
+                "categoryId": category_id,
+                "beginDate": start_date.strftime("%Y-%m-%d"),
+                "endDate": end_date.strftime("%Y-%m-%d"),
+            }
+        }
+        
+        if search_field == "title":
+            payload["dto"]["title"] = keyword
+        elif search_field == "agentCompanyName":
+            payload["dto"]["agentCompanyName"] = keyword
+        
+        return payload
+    
+    def _fetch_page(self, payload, headers):
+        """
+        请求一页数据
+        
+        Returns:
+            tuple: (rows, total)，HTTP状态码异常时返回 (None, 0)
+        """
+        # 构建基础请求参数
+        request_params = {
+            'url': self.api_url,
+            'headers': headers,
+            'data': json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+            'timeout': 30
+        }
+        
+        self.rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            if self.use_proxy:
+                response = self._post_with_failover(request_params)
+            else:
+                response = self.session.post(**request_params)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            self.rate_limiter.record(timeout=True)
+            raise
+        self.rate_limiter.record(latency=time.monotonic() - started, status_code=response.status_code)
+        
+        if response.status_code != 200:
+            logger.error(f"HTTP {response.status_code}: 请求失败 (pageNo={payload['pageNo']}, pageSize={payload['pageSize']})")
+            print(f"❌ 请求失败，状态码: {response.status_code}")
+            return None, 0
+        
+        data = response.json()
+        return data['res'].get('rows', []) or [], data['res'].get('total', 0)
+    
+    def _post_with_failover(self, request_params):
+        """
+        按代理池排名依次尝试，当前代理连接失败、超时或返回非 2xx 状态码时切换到下一个
+        
+        全部候选都失败时返回最后一次收到的响应（由调用方按状态码处理），
+        一次响应都没有时抛出最后一次的异常。
+        """
+        last_error = None
+        last_response = None
+        for candidate in self.proxy_pool.ranked()[:self.max_proxy_attempts]:
+            started = time.monotonic()
+            try:
+                response = self.session.post(proxies=self.proxy_pool.proxies_for(candidate), **request_params)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self.proxy_pool.record(candidate, False)
+                logger.warning(f"代理 {candidate} 请求失败，切换下一个: {e}")
+                last_error = e
+                continue
+            
+            ok = is_healthy(response.status_code)
+            self.proxy_pool.record(candidate, ok, time.monotonic() - started)
+            if ok:
+                return response
+            logger.warning(f"代理 {candidate} 返回 HTTP {response.status_code}，切换下一个")
+            last_response = response
+        
+        if last_response is not None:
+            return last_response
+        raise last_error or requests.exceptions.ProxyError("没有可用的代理")
+    
+    def _get_page_size(self, headers):
+        """
+        探测 queryContentPage 接受的最大 pageSize，结果在实例内缓存
+        
+        依次尝试 self.page_size_candidates 中的取值：请求失败则尝试更小的值；
+        若服务端返回的行数少于请求值且少于总数，说明服务端做了截断，以实际行数为准。
+        """
+        if self._page_size is not None:
+            return self._page_size
+        
+        with self._page_size_lock:
+            if self._page_size is not None:
+                return self._page_size
+            
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=30)
+            page_size = self.page_size
+            
+            for candidate in self.page_size_candidates:
+                payload = self._build_payload(1, candidate, None, None, self.default_site_id,
+                                              self.default_category_id, start_date, end_date)
+                try:
+                    rows, total = self._fetch_page(payload, headers)
+                except Exception as e:
+                    logger.warning(f"pageSize={candidate} 探测失败: {e}")
+                    continue
+                if rows is None:
+                    continue
+                
+                if len(rows) < candidate and len(rows) < total:
+                    page_size = len(rows)
+                else:
+                    page_size = candidate
+                break
+            
+            self._page_size = max(page_size, 1)
+            logger.info(f"queryContentPage 使用 pageSize={self._page_size}")
+            return self._page_size
+    
+    def _clamped_page_size(self, rows, total, page_size):
+        """
+        第1页返回的行数少于请求值且少于总数时，说明服务端截断了 pageSize
+        （探测窗口内数据太少时探测不出来），调小缓存的 pageSize
+        
+        Returns:
+            int: 本次查询实际生效的 pageSize
+        """
+        if not rows or len(rows) >= page_size or len(rows) >= total:
+            return page_size
+        
+        effective = len(rows)
+        with self._page_size_lock:
+            if self._page_size is None or effective < self._page_size:
+                self._page_size = effective
+        logger.warning(f"pageSize={page_size} 被服务端截断为 {effective}，改用 pageSize={effective}")
+        return effective
+    
     # 注意：search_by_keyword 方法应该与 __init__ 方法同级，不是内部方法
     def search_by_keyword(self, keyword, search_field="title", days_limit=10, site_id=None, category_id=None, referer_url=None):
-        """按关键词搜索特定网站"""
-        all_data = []
-        page_no = 1
+        """
+        按关键词搜索特定网站（search_field 为 None 时不带关键词过滤，拉取整个栏目）
         
+        先请求第1页得到总数，再按总页数并发请求剩余页（并发数不超过 self.page_workers），
+        结果按页码顺序拼接。增量模式下若已有高水位，则只返回高水位之后的新记录；
+        否则启用日缓存时，已结束日期的结果直接从本地分片读取。
+        """
         # 使用参数或默认值
         site_id = site_id or self.default_site_id
         category_id = category_id or self.default_category_id
+        headers = self._build_headers(referer_url)
+        
+        # 计算日期范围
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days_limit)
+        
+        # 增量模式：从上次的高水位开始查询
+        state_key = CrawlState.make_key(site_id, category_id, search_field, keyword)
+        mark = self.crawl_state.get(state_key) if self.incremental else None
+        if mark and mark.get('publishDate'):
+            mark_date = datetime.strptime(mark['publishDate'][:10], "%Y-%m-%d")
+            start_date = max(start_date, mark_date)
+        
+        query = (keyword, search_field, site_id, category_id, headers)
+        if mark:
+            all_data, complete = self._query_range(*query, start_date, end_date, mark=mark)
+        elif self.day_cache:
+            all_data, complete = self._query_with_day_cache(*query, start_date, end_date)
+        else:
+            all_data, complete = self._query_range(*query, start_date, end_date)
+        
+        # 仅在完整翻页后推进高水位，避免漏抓中途失败的页
+        if self.incremental and complete:
+            self.crawl_state.advance(state_key, all_data)
+        
+        return all_data
+    
+    def search_by_date_range(self, keyword, search_field, start_date, end_date, site_id=None, category_id=None, referer_url=None):
+        """
+        按关键词搜索指定日期区间（用于历史回填，不读写增量高水位）
+        
+        启用日缓存时，已结束日期的结果直接从本地分片读取。
+        
+        Returns:
+            tuple: (记录列表, 是否完整翻页)
+        """
+        site_id = site_id or self.default_site_id
+        category_id = category_id or self.default_category_id
+        query = (keyword, search_field, site_id, category_id, self._build_headers(referer_url))
         
-        # 设置Referer头
+        if self.day_cache:
+            return self._query_with_day_cache(*query, start_date, end_date)
+        return self._query_range(*query, start_date, end_date)
+    
+    def _build_headers(self, referer_url=None):
+        """构建带 Referer 的请求头"""
         headers = self.headers.copy()
         if referer_url:
             headers['Referer'] = f"{self.base_url}{referer_url}"
         else:
             headers['Referer'] = f"{self.base_url}/cms/default/webfile/3ywgg1/index.html"
+        return headers
+    
+    def _query_with_day_cache(self, keyword, search_field, site_id, category_id, headers, start_date, end_date):
+        """
+        由日缓存分片和新请求拼出整个日期窗口的结果
+        
+        已结束且已缓存的日期直接读取分片；缺失的日期合并为连续区间请求，
+        请求成功后按发布日期拆分写回缓存。结果按日期从新到旧排列。
+        
+        Returns:
+            tuple: (记录列表, 是否所有区间都请求成功)
+        """
+        query_key = DayCache.make_query_key(site_id, category_id, search_field, keyword)
+        rows_by_day, missing_ranges = self.day_cache.plan(query_key, start_date.date(), end_date.date())
+        rows_by_day = {day.isoformat(): rows for day, rows in rows_by_day.items()}
+        
+        if rows_by_day:
+            logger.info(f"日缓存命中 {len(rows_by_day)} 天，需请求 {len(missing_ranges)} 个日期区间")
+        
+        complete = True
+        for range_start, range_end in missing_ranges:
+            rows, range_complete = self._query_range(
+                keyword, search_field, site_id, category_id, headers,
+                datetime.combine(range_start, datetime.min.time()),
+                datetime.combine(range_end, datetime.min.time())
+            )
+            
+            fetched = {}
+            for item in rows:
+                fetched.setdefault(row_day(item), []).append(item)
+            for day_str, day_rows in fetched.items():
+                rows_by_day.setdefault(day_str, []).extend(day_rows)
+            
+            if not range_complete:
+                complete = False
+                continue
+            
+            # 整个区间成功后才写缓存（没有数据的日期也写入空分片）
+            day = range_start
+            while day <= range_end:
+                self.day_cache.store(query_key, day, fetched.get(day.isoformat(), []))
+                day += timedelta(days=1)
         
-        # 计算日期范围
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_limit)
+        all_data = []
+        for day_str in sorted(rows_by_day, reverse=True):
+            all_data.extend(rows_by_day[day_str])
+        return all_data, complete
+    
+    def _query_range(self, keyword, search_field, site_id, category_id, headers, start_date, end_date, mark=None):
+        """
+        查询一个日期区间的所有页
         
-        while True:
+        Returns:
+            tuple: (记录列表, 是否完整翻页)
+        """
+        all_data = []
+        page_size = self._get_page_size(headers)
+        
+        def fetch(page_no, size):
+            payload = self._build_payload(page_no, size, keyword, search_field,
+                                          site_id, category_id, start_date, end_date)
+            return self._fetch_page(payload, headers)
+        
+        def fetch_safe(page_no, size):
+            # 并发翻页时单页失败不影响其他页
             try:
-                payload = {
-                    "pageNo": page_no,
-                    "pageSize": self.page_size,
-                    "dto": {
-                        "siteId": site_id,
-                        "categoryId": category_id,
-                        "beginDate": start_date.strftime("%Y-%m-%d"),
-                        "endDate": end_date.strftime("%Y-%m-%d"),
-                    }
-                }
-                
-                if search_field == "title":
-                    payload["dto"]["title"] = keyword
-                elif search_field == "agentCompanyName":
-                    payload["dto"]["agentCompanyName"] = keyword
-                
-                # 构建基础请求参数
-                request_params = {
-                    'url': self.api_url,
-                    'headers': headers,
-                    'data': json.dumps(payload, ensure_ascii=False).encode('utf-8'),
-                    'timeout': 30
-                }
-                
-                # 仅当需要代理时，才添加 proxies 参数
-                if self.use_proxy:
-                    request_params['proxies'] = self.proxy_config
-                    if page_no == 1:
-                        print(f"📡 使用代理请求: {self.proxy_config['http']}")
-                
-                response = requests.post(**request_params)
-                
-                if response.status_code != 200:
-                    logger.error(f"HTTP {response.status_code}: 请求失败")
-                    print(f"❌ 请求失败，状态码: {response.status_code}")
-                    break
-                
-                data = response.json()
-                rows = data['res'].get('rows', [])
-                total = data['res'].get('total', 0)
-                
-                if page_no == 1:
-                    logger.info(f"网站配置[site_id={site_id}, category_id={category_id}] - 总共找到 {total} 条相关记录")
-                    print(f"✅ 请求成功，找到 {total} 条相关记录")
-                
-                if not rows:
-                    break
-                
-                all_data.extend(rows)
-                
-                if len(rows) < self.page_size:
-                    break
-                    
-                page_no += 1
-                time.sleep(1)  # 增加延迟，避免请求过快
-                
-            except requests.exceptions.ProxyError as e:
-                logger.error(f"代理连接失败: {e}")
-                print(f"❌ 代理连接失败: {e}")
-                print("尝试使用备用代理或直接连接...")
-                break
-            except requests.exceptions.ConnectionError as e:
-                logger.error(f"连接错误: {e}")
-                print(f"❌ 连接错误: {e}")
-                break
+                return fetch(page_no, size)
             except Exception as e:
-                logger.error(f"搜索异常: {e}")
-                print(f"❌ 搜索异常: {e}")
+                logger.error(f"第 {page_no} 页请求异常: {e}")
+                return None, 0
+        
+        complete = False
+        try:
+            if mark:
+                complete = self._fetch_new_pages(all_data, fetch, page_size, mark)
+            else:
+                complete = self._fetch_all_pages(all_data, fetch, fetch_safe, page_size, site_id, category_id)
+            
+        except requests.exceptions.ProxyError as e:
+            logger.error(f"代理连接失败: {e}")
+            print(f"❌ 代理连接失败: {e}")
+            print("尝试使用备用代理或直接连接...")
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"连接错误: {e}")
+            print(f"❌ 连接错误: {e}")
+        except Exception as e:
+            logger.error(f"搜索异常: {e}")
+            print(f"❌ 搜索异常: {e}")
+        
+        return all_data, complete
+    
+    def _fetch_all_pages(self, all_data, fetch, fetch_safe, page_size, site_id, category_id):
+        """
+        全量翻页：请求第1页得到总数后并发请求剩余页，结果追加到 all_data
+        
+        Returns:
+            bool: 是否所有页都请求成功且取到的记录数不少于总数
+        """
+        rows, total = fetch(1, page_size)
+        if rows is None:
+            return False
+        
+        logger.info(f"网站配置[site_id={site_id}, category_id={category_id}] - 总共找到 {total} 条相关记录")
+        print(f"✅ 请求成功，找到 {total} 条相关记录")
+        
+        all_data.extend(rows)
+        page_size = self._clamped_page_size(rows, total, page_size)
+        if len(rows) < page_size:
+            return True
+        
+        # 已知总数后，按实际生效的 pageSize 并发请求剩余页
+        complete = True
+        total_pages = -(-total // page_size)
+        last_rows = rows
+        if total_pages > 1:
+            page_numbers = list(range(2, total_pages + 1))
+            workers = max(1, min(self.page_workers, len(page_numbers)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                page_results = list(executor.map(lambda page_no: fetch_safe(page_no, page_size), page_numbers))
+            
+            for page_no, (rows, _) in zip(page_numbers, page_results):
+                if rows is None:
+                    logger.warning(f"第 {page_no} 页请求失败，已跳过")
+                    complete = False
+                    continue
+                all_data.extend(rows)
+                last_rows = rows
+        
+        # 翻页期间若有新增数据（最后一页仍是满页），继续顺序翻页直到出现短页
+        page_no = total_pages + 1
+        while len(last_rows) >= page_size:
+            rows, _ = fetch(page_no, page_size)
+            if not rows:
                 break
+            all_data.extend(rows)
+            last_rows = rows
+            page_no += 1
+        
+        # 取到的记录少于总数时（中间页被截断、返回空页等）不算完整，不推进高水位、不写日缓存
+        if len(all_data) < total:
+            logger.warning(f"翻页结束只取到 {len(all_data)}/{total} 条记录，本次结果视为不完整")
+            return False
+        return complete
+    
+    def _fetch_new_pages(self, all_data, fetch, page_size, mark):
+        """
+        增量翻页：逐页请求，只保留高水位之后的新记录，出现整页都是已知记录时停止
         
-        return all_data
+        Returns:
+            bool: 是否正常翻页结束
+        """
+        page_no = 1
+        while True:
+            rows, total = fetch(page_no, page_size)
+            if rows is None:
+                return False
+            
+            new_rows = [item for item in rows if not CrawlState.is_known(mark, item)]
+            all_data.extend(new_rows)
+            
+            if page_no == 1:
+                logger.info(f"增量爬取 - 高水位 {mark['publishDate']}，窗口内共 {total} 条记录")
+                # 第1页被截断时按实际生效的 pageSize 翻页，短页不代表已到最后一页
+                page_size = self._clamped_page_size(rows, total, page_size)
+            
+            if not new_rows or len(rows) < page_size:
+                logger.info(f"增量爬取 - 翻页 {page_no} 页，新增 {len(all_data)} 条记录")
+                return True
+            page_no += 1
     
-    def search_website(self, website_config, days_limit=10):
-        """搜索单个网站的所有关键词"""
+    def commit_crawl_state(self):
+        """保存本次爬取的高水位（应在数据成功落地后调用）"""
+        if self.incremental:
+            self.crawl_state.commit()
+    
+    def _search_task(self, task, days_limit, date_range=None, raise_errors=False):
+        """执行单个 (网站, 关键词, 搜索字段) 查询任务"""
+        website_config, keyword, search_field = task
+        try:
+            if date_range:
+                rows, complete = self.search_by_date_range(
+                    keyword, search_field, date_range[0], date_range[1],
+                    website_config["site_id"], website_config["category_id"],
+                    website_config["url"]
+                )
+                if not complete:
+                    # 回填模式下不完整的结果视为失败，分片不会被标记为完成
+                    raise RuntimeError("翻页未完成")
+                return rows
+            return self.search_by_keyword(
+                keyword, search_field, days_limit,
+                website_config["site_id"], website_config["category_id"],
+                website_config["url"]
+            )
+        except Exception as e:
+            logger.error(f"查询任务失败 [{website_config['name']}/{keyword}/{search_field}]: {e}")
+            if raise_errors:
+                raise
+            return []
+    
+    def _build_search_tasks(self, website_configs):
+        """构建 (网站, 关键词, 搜索字段) 查询任务列表"""
+        if self.search_mode == "category":
+            # 单次拉取模式：每个栏目一个任务，不带关键词过滤
+            return [(config, None, None) for config in website_configs]
+        return [
+            (config, keyword, search_field)
+            for config in website_configs
+            for keyword in self.keywords
+            for search_field in self.search_fields
+        ]
+    
+    def _crawl_websites(self, website_configs, days_limit=10, date_range=None, raise_errors=False):
+        """
+        并发执行 (网站, 关键词, 搜索字段) 查询矩阵
+        
+        所有查询作为独立任务提交到线程池，同时进行中的任务数不超过 self.max_workers。
+        结果按网站配置、关键词、搜索字段的固定顺序汇总，与串行执行的输出顺序一致。
+        
+        Args:
+            date_range: (开始时间, 结束时间)，指定时按区间查询而不是最近 days_limit 天
+            raise_errors: 任一查询任务失败时抛出异常（回填模式使用）
+        
+        Returns:
+            list: 与 website_configs 一一对应的网站结果列表
+        """
+        tasks = self._build_search_tasks(website_configs)
+        if not tasks:
+            return [[] for _ in website_configs]
+        
+        workers = max(1, min(self.max_workers, len(tasks)))
+        logger.info(f"提交 {len(tasks)} 个查询任务，并发数: {workers}")
+        
+        # executor.map 按提交顺序返回结果，保证输出顺序确定
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            task_results = list(executor.map(
+                lambda task: self._search_task(task, days_limit, date_range, raise_errors), tasks
+            ))
+        
+        # 按网站 -> 关键词分组（保持字段顺序：标题在前，采购单位在后）
+        grouped = {}
+        if self.search_mode == "category":
+            matcher = KeywordMatcher(self.keywords)
+            for (config, _, _), rows in zip(tasks, task_results):
+                grouped[id(config)] = self._match_keywords(matcher, rows)
+        else:
+            for (config, keyword, _), rows in zip(tasks, task_results):
+                grouped.setdefault(id(config), {}).setdefault(keyword, []).extend(rows)
+        
+        return [
+            self._collect_website_results(config, grouped.get(id(config), {}))
+            for config in website_configs
+        ]
+    
+    def _match_keywords(self, matcher, rows):
+        """
+        在本地为每条记录标注命中的关键词和字段
+        
+        命中信息写入记录的 matchedKeywords 字段，格式为 {关键词: [字段, ...]}。
+        
+        Returns:
+            dict: {关键词: [命中该关键词的记录, ...]}
+        """
+        keyword_rows = {}
+        for item in rows:
+            matches = matcher.match_item(item, self.search_fields)
+            if not matches:
+                continue
+            item['matchedKeywords'] = matches
+            for keyword in matches:
+                keyword_rows.setdefault(keyword, []).append(item)
+        
+        logger.info(f"本地关键词匹配: {len(rows)} 条记录中 {sum(1 for item in rows if 'matchedKeywords' in item)} 条命中")
+        return keyword_rows
+    
+    def _collect_website_results(self, website_config, keyword_rows):
+        """对单个网站各关键词的查询结果去重并提取字段"""
         website_results = []
         website_name = website_config["name"]
         
         logger.info(f"\n{'='*60}")
-        logger.info(f"开始爬取网站: {website_name}")
+        logger.info(f"汇总网站: {website_name}")
         logger.info(f"网站URL: {website_config['url']}")
-        # 修复：删除多余的 logger. 和重复的变量名
         logger.info(f"配置: site_id={website_config['site_id']}, category_id={website_config['category_id']}")
         
         for keyword in self.keywords:
-            logger.info(f"处理关键词: {keyword}")
-            
-            # 在标题中搜索
-            title_results = self.search_by_keyword(
-                keyword, "title", days_limit,
-                website_config["site_id"], website_config["category_id"],
-                website_config["url"]
-            )
-            time.sleep(1)
-            
-            # 在采购单位中搜索
-            company_results = self.search_by_keyword(
-                keyword, "agentCompanyName", days_limit,
-                website_config["site_id"], website_config["category_id"],
-                website_config["url"]
+            # 合并该关键词在标题、采购单位中的结果
+            website_results.extend(
+                self._collect_keyword_results(website_config, keyword, keyword_rows.get(keyword, []))
             )
-            
-            # 合并结果
-            keyword_results = title_results + company_results
-            
-            # 去重
-            seen = set()
-            unique_results = []
-            for item in keyword_results:
-                item_id = f"{item.get('title', '')}_{item.get('publishDate', '')}"
-                if item_id not in seen:
-                    seen.add(item_id)
-                    unique_results.append(item)
-            
-            logger.info(f"关键词 '{keyword}' 在网站 '{website_name}' 去重后得到 {len(unique_results)} 条唯一数据")
-            
-            # 提取数据
-            for item in unique_results:
-                extracted = self.extract_item_fields(item)
-                extracted['搜索关键词'] = keyword
-                extracted['来源网站'] = website_name
-                extracted['网站URL'] = f"{self.base_url}{website_config['url']}"
-                website_results.append(extracted)
         
         logger.info(f"网站 '{website_name}' 总计爬取 {len(website_results)} 条数据")
         return website_results
     
+    def _collect_keyword_results(self, website_config, keyword, keyword_results):
+        """对单个网站、单个关键词的查询结果去重并提取字段"""
+        website_name = website_config["name"]
+        
+        # 去重
+        seen = set()
+        unique_results = []
+        for item in keyword_results:
+            item_id = item_key(item)
+            if item_id not in seen:
+                seen.add(item_id)
+                unique_results.append(item)
+        
+        logger.info(f"关键词 '{keyword}' 在网站 '{website_name}' 去重后得到 {len(unique_results)} 条唯一数据")
+        
+        # 提取数据
+        extracted_results = []
+        for item in unique_results:
+            extracted = self.extract_item_fields(item)
+            extracted['搜索关键词'] = keyword
+            extracted['来源网站'] = website_name
+            extracted['网站URL'] = f"{self.base_url}{website_config['url']}"
+            extracted_results.append(extracted)
+        
+        if self.near_duplicates is not None:
+            self._assign_similar_groups(unique_results, extracted_results)
+        if self.history_store is not None:
+            self._store_history(unique_results, extracted_results)
+        return extracted_results
+    
+    def _assign_similar_groups(self, items, extracted_results):
+        """为记录标注相似公告分组（失败时不标注，不影响爬取）"""
+        try:
+            groups = self.near_duplicates.assign_many(
+                (item_key(item), item.get('title', ''), item.get('publishDate', ''), item.get('text') or '')
+                for item in items
+            )
+        except Exception as e:
+            logger.warning(f"相似公告检测失败: {e}")
+            return
+        for extracted, group_id in zip(extracted_results, groups):
+            extracted[GROUP_FIELD] = group_id
+    
+    def _store_history(self, items, extracted_results):
+        """将提取的记录连同完整正文写入历史检索库（失败不影响爬取）"""
+        rows = [
+            dict(extracted, 全文=item.get('text') or '')
+            for item, extracted in zip(items, extracted_results)
+        ]
+        try:
+            self.history_store.add_many(rows)
+        except Exception as e:
+            logger.warning(f"写入历史检索库失败: {e}")
+    
+    def search_website(self, website_config, days_limit=10):
+        """搜索单个网站的所有关键词"""
+        logger.info(f"开始爬取网站: {website_config['name']}")
+        return self._crawl_websites([website_config], days_limit)[0]
+    
     # 保持与旧代码兼容的方法
     def search_all_keywords(self, days_limit=10):
         """兼容旧版本的搜索方法（只搜索第一个网站）"""
@@ -251,57 +714,22 @@ class JnkgBiddingSpider:
     
     def search_all_websites(self, days_limit=10):
         """搜索所有网站的关键词（新方法）"""
-        all_results = []
-        
         print(f"\n{'='*60}")
         print("🚀 开始爬取所有网站")
         print(f"搜索关键词: {self.keywords}")
         print(f"时间范围: 最近{days_limit}天")
         print(f"网站数量: {len(self.website_configs)}个")
         if self.use_proxy:
-            print(f"📡 使用代理: {self.proxy_config['http']}")
+            print(f"📡 使用代理池，当前最优: {self.proxy_pool.best()}")
         print(f"{'='*60}\n")
         
-        for config in self.website_configs:
-            try:
-                print(f"🌐 正在爬取网站: {config['name']}")
-                
-                # 爬取当前网站
-                website_data = self.search_website(config, days_limit)
-                
-                # 移除网站相关字段
-                clean_data = []
-                for item in website_data:
-                    # 创建副本，避免修改原数据
-                    clean_item = item.copy()
-                    if '来源网站' in clean_item:
-                        del clean_item['来源网站']
-                    if '网站URL' in clean_item:
-                        del clean_item['网站URL']
-                    clean_data.append(clean_item)
-                
-                print(f"✅ 网站 '{config['name']}' 爬取完成: {len(clean_data)} 条数据")
-                all_results.extend(clean_data)
-                
-                # 网站间延迟
-                if config != self.website_configs[-1]:  # 不是最后一个网站
-                    time.sleep(2)
-                
-            except Exception as e:
-                print(f"❌ 爬取网站 {config['name']} 时出错: {e}")
-                continue
+        print(f"⚙️  并发数: {self.max_workers}")
+        
+        # 所有网站的查询任务一起并发执行
+        website_results = self._crawl_websites(self.website_configs, days_limit)
+        all_results, unique_results = self._merge_website_results(website_results)
         
-        # 跨网站去重
         if all_results:
-            seen = set()
-            unique_results = []
-            for item in all_results:
-                # 使用标题+发布时间作为唯一标识
-                item_id = f"{item.get('标题', '')}_{item.get('发布时间', '')}"
-                if item_id not in seen:
-                    seen.add(item_id)
-                    unique_results.append(item)
-            
             print(f"\n📊 所有网站爬取完成")
             print(f"原始数据: {len(all_results)} 条")
             print(f"去重后: {len(unique_results)} 条")
@@ -309,6 +737,95 @@ class JnkgBiddingSpider:
         
         return unique_results if all_results else []
     
+    def _merge_website_results(self, website_results, seen=None):
+        """
+        合并各网站结果：移除网站相关字段，并按 标题+发布时间 跨网站去重
+        
+        Args:
+            website_results: 与 self.website_configs 一一对应的网站结果列表
+            seen: 已见过的唯一标识集合（跨批次去重时传入同一个集合）
+        
+        Returns:
+            tuple: (合并后的全部数据, 去重后的数据)
+        """
+        all_results = []
+        for config, website_data in zip(self.website_configs, website_results):
+            # 移除网站相关字段
+            clean_data = [self._strip_website_fields(item) for item in website_data]
+            print(f"✅ 网站 '{config['name']}' 爬取完成: {len(clean_data)} 条数据")
+            all_results.extend(clean_data)
+        
+        return all_results, self._dedupe_across_websites(all_results, seen)
+    
+    def _strip_website_fields(self, item):
+        """移除网站相关字段（创建副本，避免修改原数据）"""
+        clean_item = item.copy()
+        if '来源网站' in clean_item and not self.keep_source_field:
+            del clean_item['来源网站']
+        if '网站URL' in clean_item:
+            del clean_item['网站URL']
+        return clean_item
+    
+    @staticmethod
+    def _dedupe_across_websites(items, seen=None):
+        """跨网站去重：使用规范化的标题+发布时间作为唯一标识"""
+        seen = set() if seen is None else seen
+        unique_results = []
+        for item in items:
+            item_id = item_key(item)
+            if item_id not in seen:
+                seen.add(item_id)
+                unique_results.append(item)
+        return unique_results
+    
+    def iter_search_results(self, days_limit=10):
+        """
+        流式返回所有网站的搜索结果（已按关键词、跨网站去重，不含网站字段）
+        
+        查询任务并发执行，但同时提交的任务不超过并发数的两倍；下游消费变慢时
+        不再提交新任务。结果按任务顺序逐组产出，与 search_all_websites 的内容和顺序一致。
+        """
+        tasks = self._build_search_tasks(self.website_configs)
+        matcher = KeywordMatcher(self.keywords) if self.search_mode == "category" else None
+        seen = set()
+        pending = []
+        
+        for index, ((config, keyword, _), rows) in enumerate(self._iter_task_results(tasks, days_limit)):
+            if matcher:
+                keyword_rows = self._match_keywords(matcher, rows)
+                extracted = self._collect_website_results(config, keyword_rows)
+            else:
+                # 同一网站、同一关键词的各字段结果到齐后再去重
+                pending.extend(rows)
+                next_task = tasks[index + 1] if index + 1 < len(tasks) else None
+                if next_task and next_task[0] is config and next_task[1] == keyword:
+                    continue
+                extracted = self._collect_keyword_results(config, keyword, pending)
+                pending = []
+            
+            clean_data = [self._strip_website_fields(item) for item in extracted]
+            for item in self._dedupe_across_websites(clean_data, seen):
+                yield item
+    
+    def _iter_task_results(self, tasks, days_limit):
+        """按提交顺序逐个产出 (任务, 结果)，提交窗口有上限以形成背压"""
+        workers = max(1, min(self.max_workers, len(tasks) or 1))
+        window = workers * 2
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = deque()
+            task_iter = iter(tasks)
+            for task in islice(task_iter, window):
+                futures.append((task, executor.submit(self._search_task, task, days_limit)))
+            
+            while futures:
+                task, future = futures.popleft()
+                rows = future.result()
+                next_task = next(task_iter, None)
+                if next_task is not None:
+                    futures.append((next_task, executor.submit(self._search_task, next_task, days_limit)))
+                yield task, rows
+    
     def extract_item_fields(self, item):
         """提取数据字段"""
         publish_date = item.get('publishDate', '')
@@ -381,23 +898,15 @@ class JnkgBiddingSpider:
         all_data = []
         
         for config in self.website_configs:
-            try:
-                # 如果配置中没有site_id或category_id，尝试发现
-                if "site_id" not in config or "category_id" not in config:
-                    logger.warning(f"网站 {config['name']} 缺少配置参数，尝试使用默认值")
-                    config["site_id"] = self.default_site_id
-                    config["category_id"] = self.default_category_id
-                
-                # 爬取当前网站
-                website_data = self.search_website(config, days_limit=10)
-                all_data.extend(website_data)
-                
-                # 网站间延迟，避免请求过于频繁
-                time.sleep(2)
-                
-            except Exception as e:
-                logger.error(f"爬取网站 {config['name']} 时出错: {e}")
-                continue
+            # 如果配置中没有site_id或category_id，使用默认值
+            if "site_id" not in config or "category_id" not in config:
+                logger.warning(f"网站 {config['name']} 缺少配置参数，尝试使用默认值")
+                config["site_id"] = self.default_site_id
+                config["category_id"] = self.default_category_id
+        
+        # 并发爬取所有网站
+        for website_data in self._crawl_websites(self.website_configs, days_limit=10):
+            all_data.extend(website_data)
         
         if not all_data:
             print("⚠️  所有网站均未找到符合条件的数据")
@@ -407,8 +916,8 @@ class JnkgBiddingSpider:
         seen = set()
         unique_data = []
         for item in all_data:
-            # 使用标题+发布时间+来源网站作为唯一标识
-            item_id = f"{item.get('标题', '')}_{item.get('发布时间', '')}_{item.get('来源网站', '')}"
+            # 使用标题+发布时间+来源网站作为唯一标识（各网站分别保留）
+            item_id = item_key(item, with_site=True)
             if item_id not in seen:
                 seen.add(item_id)
                 unique_data.append(item)
@@ -423,67 +932,57 @@ class JnkgBiddingSpider:
             # 否则使用普通保存
             self.save_results(unique_data)
         
+        # 结果已保存，推进增量爬取高水位
+        self.commit_crawl_state()
+        
         print(f"\n🎉 爬虫执行完成！")
     
-    def save_results_enhanced(self, data):
-        """增强版保存结果（包含多网站信息）"""
-        if not data:
+    def save_results_enhanced(self, data, background=False):
+        """
+        增强版保存结果（包含多网站信息）
+        
+        记录只遍历一次，同时写入 Excel 的"所有数据"、各网站分表、"统计"表（write_only 模式）
+        和 CSV，内存占用不随数据量增长；data 可以是生成器。
+        background=True 时在后台线程导出，立即返回 Future（result() 为导出汇总）。
+        """
+        if isinstance(data, list) and not data:
             print("⚠️  没有数据可保存")
             return None
         
-        df = pd.DataFrame(data)
-        
-        # 按来源网站分组统计
-        website_stats = df['来源网站'].value_counts()
+        # 生成文件名（毫秒 + 随机后缀，同一秒内的多次导出互不覆盖）
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        filename = f"晋能控股招标_多网站_{timestamp}_{uuid.uuid4().hex[:6]}"
         
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"晋能控股招标_多网站_{timestamp}"
+        if background:
+            future = export_rows(data, filename, background=True)
+            future.add_done_callback(
+                lambda done: self._print_export_summary(done.result()) if done.exception() is None
+                else print(f"保存结果失败: {done.exception()}")
+            )
+            return future
+        return self._print_export_summary(export_rows(data, filename))
+    
+    def _print_export_summary(self, summary):
+        """输出导出结果和统计"""
+        if not summary['total']:
+            # 没有记录时导出器不会创建任何文件
+            print("⚠️  没有数据可保存")
+            return summary
         
-        try:
-            # 保存Excel
-            excel_file = f"{filename}.xlsx"
-            
-            # 使用ExcelWriter创建多个sheet
-            with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-                # 主表：所有数据
-                df.to_excel(writer, sheet_name='所有数据', index=False)
-                
-                # 按网站分表
-                for website in df['来源网站'].unique():
-                    website_df = df[df['来源网站'] == website]
-                    # 简化sheet名（Excel sheet名最多31字符）
-                    sheet_name = f"{website}"[:31]
-                    website_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # 统计数据表
-                stats_df = pd.DataFrame({
-                    '网站': website_stats.index,
-                    '数据量': website_stats.values
-                })
-                stats_df.to_excel(writer, sheet_name='统计', index=False)
-            
+        if summary['excel_file']:
             print(f"\n✅ 数据已保存到Excel:")
-            print(f"📁 文件位置: {os.path.abspath(excel_file)}")
-            
-            # 保存CSV
-            csv_file = f"{filename}.csv"
-            df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-            print(f"📁 文件位置: {os.path.abspath(csv_file)}")
-            
-        except Exception as e:
-            print(f"保存Excel失败: {e}")
-            # 只保存CSV
-            csv_file = f"{filename}.csv"
-            df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-            print(f"✅ 数据已保存到CSV: {os.path.abspath(csv_file)}")
+            print(f"📁 文件位置: {os.path.abspath(summary['excel_file'])}")
+            print(f"📁 文件位置: {os.path.abspath(summary['csv_file'])}")
+        else:
+            print(f"✅ 数据已保存到CSV: {os.path.abspath(summary['csv_file'])}")
         
         # 显示统计
         print(f"\n📊 统计结果:")
-        print(f"总计数据: {len(df)} 条")
-        for website, count in website_stats.items():
+        print(f"总计数据: {summary['total']} 条")
+        for website, count in summary['groups'].items():
             print(f"  - {website}: {count} 条")
-        print(f"时间范围: {df['发布时间'].min()} 至 {df['发布时间'].max()}")
+        print(f"时间范围: {summary['min_date']} 至 {summary['max_date']}")
+        return summary
 
 def main():
     spider = JnkgBiddingSpider()
@@ -0,0 +1,79 @@
+# test_backfill.py - 回填断点续跑测试（python -m pytest test_backfill.py）
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+
+class FakeSpider:
+    """按分片返回空结果的爬虫替身；failing 中的分片抛出异常（模拟中断）"""
+
+    def __init__(self):
+        self.website_configs = [{'name': '3ywgg1', 'site_id': '725', 'category_id': '238'}]
+        self.keywords = ['天安']
+        self.search_mode = 'keyword'
+        self.failing = set()
+        self.crawled = []
+        self._lock = threading.Lock()
+
+    def _crawl_websites(self, website_configs, days_limit=10, date_range=None, raise_errors=False):
+        with self._lock:
+            self.crawled.append(date_range)
+        if date_range in self.failing:
+            raise RuntimeError('翻页未完成')
+        return [[]]
+
+    def _merge_website_results(self, website_results, seen):
+        return [], []
+
+
+@pytest.fixture
+def backfill(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('SPIDER_HISTORY', 'false')
+    monkeypatch.setenv('SPIDER_NEAR_DUP', 'false')
+    import backfill
+    monkeypatch.setattr(backfill, 'DEFAULT_CHECKPOINT_DIR', str(tmp_path / 'backfill'))
+    return backfill
+
+
+def run_days(backfill, spider, today, days=28):
+    """模拟 python backfill.py --days N 在 today 运行"""
+    checkpoint = backfill.BackfillCheckpoint(backfill.make_job_id(spider, 7, days=days))
+    start, end = checkpoint.resolve_range(today - timedelta(days=days), today, 7)
+    return backfill.run_backfill(spider, start, end, 7, 1, checkpoint=checkpoint)
+
+
+def test_days_backfill_resumes_on_a_later_day(backfill):
+    spider = FakeSpider()
+    first_day = datetime(2025, 3, 10)
+    shards = backfill.split_date_range(first_day - timedelta(days=28), first_day, 7)
+    spider.failing = {shards[1], shards[3]}
+
+    stats = run_days(backfill, spider, first_day)
+    assert (stats['done'], stats['failed']) == (len(shards) - 2, 2)
+
+    # 第二天重跑：沿用原区间，只重试失败的分片
+    spider.failing = set()
+    spider.crawled = []
+    stats = run_days(backfill, spider, first_day + timedelta(days=1))
+    assert sorted(spider.crawled) == sorted([shards[1], shards[3]])
+    assert (stats['done'], stats['failed']) == (len(shards), 0)
+
+    # 上次已全部完成：按新的日期区间开始新一轮回填
+    spider.crawled = []
+    later_day = first_day + timedelta(days=2)
+    run_days(backfill, spider, later_day)
+    assert sorted(spider.crawled) == sorted(backfill.split_date_range(later_day - timedelta(days=28), later_day, 7))
+
+
+def test_explicit_range_rerun_skips_completed_shards(backfill):
+    spider = FakeSpider()
+    start, end = datetime(2025, 1, 1), datetime(2025, 1, 31)
+
+    backfill.run_backfill(spider, start, end, 7, 1)
+    spider.crawled = []
+    stats = backfill.run_backfill(spider, start, end, 7, 1)
+
+    assert spider.crawled == []
+    assert stats['done'] == stats['shards']
@@ -0,0 +1,132 @@
+# test_feishu_writer.py - 基于 feishu_stub 的飞书写入器离线测试（python -m pytest test_feishu_writer.py）
+import pandas as pd
+import pytest
+
+from dedupe_index import DedupeIndex
+from feishu_stub import LocalBitableStub
+from feishu_writer import FeishuBitableWriter
+
+
+def make_df(count, start=0):
+    return pd.DataFrame([
+        {
+            '项目名称': f'天安公司物资采购项目{i}',
+            '发布时间': f'2025-03-{i % 28 + 1:02d}',
+            '项目编号': f'P{i:05d}',
+            '采购单位': '天安公司',
+        }
+        for i in range(start, start + count)
+    ])
+
+
+def write_requests(stub):
+    return [endpoint for _, endpoint in stub.requests if endpoint in ('batch_create', 'batch_update')]
+
+
+@pytest.fixture
+def stub():
+    return LocalBitableStub()
+
+
+@pytest.fixture
+def make_writer(stub, tmp_path):
+    writers = []
+
+    def make(upsert=False):
+        writer = FeishuBitableWriter('app', 'secret', 'app_token', 'table_id', use_local_index=False, session=stub)
+        writer.dedupe_index = DedupeIndex('stub', path=str(tmp_path / 'index.sqlite3'))
+        writer.upsert = upsert
+        writer.retry_backoff = 0
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.dedupe_index.close()
+
+
+def test_incremental_sync_fetches_only_changed_records(stub, make_writer):
+    stub.seed({
+        '项目名称': f'测试项目{i}',
+        '发布时间': 1760000000000 + i * 86400000,
+        '项目编号': f'P{i:05d}',
+    } for i in range(2000))
+    writer = make_writer()
+
+    stub.requests.clear()
+    assert writer.sync_dedupe_index()
+    # 字段列表 + 每页 500 条的 4 次 search
+    assert len(stub.requests) == 5
+    assert writer.dedupe_index.count() == 2000
+
+    stub.seed([{'项目名称': '新增项目', '发布时间': 1770000000000, '项目编号': 'NEW'}])
+    stub.requests.clear()
+    assert writer.sync_dedupe_index()
+    assert stub.requests == [('POST', 'search')]
+    assert writer.dedupe_index.count() == 2001
+
+
+def test_retry_after_lost_response_does_not_duplicate(stub, make_writer):
+    writer = make_writer()
+    stub.fail_next(1, after_commit=True)
+
+    success, fail, duplicate = writer.add_records(make_df(3))
+
+    assert (success, fail, duplicate) == (3, 0, 0)
+    assert write_requests(stub) == ['batch_create', 'batch_create']
+    assert len(stub.records) == 3
+
+
+def test_data_error_bisects_to_the_bad_record(stub, make_writer):
+    writer = make_writer()
+    records = [{'fields': {'项目名称': f'项目{i}', '发布时间': 1760000000000, '项目编号': f'P{i}'}} for i in range(8)]
+    records[5]['fields']['发布时间'] = '不是日期'
+
+    success, fail = writer._add_batch_records(records, [f'P{i}' for i in range(8)])
+
+    assert (success, fail) == (7, 1)
+    assert {record['fields']['项目编号'] for record in stub.records} == {f'P{i}' for i in range(8) if i != 5}
+    # 8 -> 4 + 4 -> 2 + 2 -> 1 + 1，有问题的记录所在的一路逐层拆分
+    assert len(write_requests(stub)) == 7
+
+
+def test_schema_error_fails_without_bisecting(stub, make_writer):
+    writer = make_writer()
+    records = [{'fields': {'项目名称': f'项目{i}', '不存在的字段': 'x'}} for i in range(8)]
+
+    assert writer._add_batch_records(records) == (0, 8)
+    assert len(write_requests(stub)) == 1
+
+
+def test_upsert_updates_only_changed_records(stub, make_writer):
+    writer = make_writer(upsert=True)
+    df = make_df(5)
+    assert writer.add_records(df) == (5, 0, 0)
+
+    stub.requests.clear()
+    assert writer.add_records(df) == (0, 0, 5)
+    assert write_requests(stub) == []
+
+    changed = df.copy()
+    changed.loc[2, '采购单位'] = '晋圣公司'
+    assert writer.add_records(changed) == (1, 0, 4)
+    assert write_requests(stub) == ['batch_update']
+    assert stub.records[2]['fields']['采购单位'] == '晋圣公司'
+
+    # 远端同步回来的内容哈希与本地一致，全量对账后不产生多余的更新
+    writer.reconcile_dedupe_index()
+    stub.requests.clear()
+    assert writer.add_records(changed) == (0, 0, 5)
+    assert write_requests(stub) == []
+
+
+def test_rate_limit_pauses_for_retry_after(stub, make_writer, monkeypatch):
+    writer = make_writer()
+    pauses = []
+    monkeypatch.setattr(writer.upload_limiter, 'pause', pauses.append)
+    stub.throttle(1, retry_after=3)
+
+    assert writer.add_records(make_df(3)) == (3, 0, 0)
+    assert pauses == [3.0]
+    assert write_requests(stub) == ['batch_create', 'batch_create']
+    assert len(stub.records) == 3
@@ -0,0 +1,37 @@
+# test_near_duplicates.py - SimHash 签名与海明距离测试（python -m pytest test_near_duplicates.py）
+import random
+
+from near_duplicates import hamming_distance, simhash
+
+TITLE = '晋能控股天安公司皮带机托辊采购招标公告'
+BODY = '晋能控股集团天安公司关于皮带输送机托辊采购项目进行公开招标，欢迎符合资格的供应商参加。投标截止时间为2025年3月10日。'
+
+
+def test_signature_is_unsigned_64_bit():
+    for i in range(200):
+        signature = simhash(f"{TITLE}{i}", BODY)
+        assert 0 <= signature < 1 << 64
+
+
+def test_identical_text_has_distance_zero():
+    assert hamming_distance(simhash(TITLE, BODY), simhash(TITLE, BODY)) == 0
+
+
+def test_one_token_apart_is_near_duplicate():
+    a = simhash(TITLE, BODY)
+    b = simhash(TITLE, BODY.replace('10日', '20日'))
+    assert hamming_distance(a, b) <= 4
+
+
+def test_hamming_distance_matches_bit_count_for_high_bits():
+    rng = random.Random(0)
+    for _ in range(2000):
+        a = rng.getrandbits(64)
+        flips = rng.sample(range(64), 3)
+        b = a
+        for bit in flips:
+            b ^= 1 << bit
+        assert hamming_distance(a, b) == 3
+        # SQLite 中以有符号整数保存，读回后距离不变
+        signed_b = b - (1 << 64) if b >= 1 << 63 else b
+        assert hamming_distance(a, signed_b) == 3
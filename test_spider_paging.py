@@ -0,0 +1,109 @@
+# test_spider_paging.py - 服务端截断 pageSize 时的翻页测试（python -m pytest test_spider_paging.py）
+from datetime import datetime, timedelta
+
+import pytest
+
+
+class ClampingServer:
+    """模拟 queryContentPage：pageSize 超过 cap 时静默截断为 cap；available 条之后的数据取不到"""
+
+    def __init__(self, rows, cap=20, available=None):
+        self.rows = rows
+        self.cap = cap
+        self.available = len(rows) if available is None else available
+        self.requests = []
+
+    def __call__(self, payload, headers):
+        self.requests.append(payload)
+        dto = payload['dto']
+        rows = [row for row in self.rows if dto['beginDate'] <= row['publishDate'][:10] <= dto['endDate']]
+        size = min(payload['pageSize'], self.cap)
+        start = (payload['pageNo'] - 1) * size
+        end = min(start + size, self.available)
+        return rows[start:end], len(rows)
+
+
+def make_rows(count, newest_days_ago=5, prefix=''):
+    """count 条记录，发布时间从新到旧，分布在已结束的日期上"""
+    newest = datetime.now() - timedelta(days=newest_days_ago)
+    return [
+        {
+            'id': f'{prefix}{i}',
+            'title': f'天安公司物资采购公告{i}',
+            'publishDate': (newest - timedelta(hours=3 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def spider(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('CRAWLER_CACHE_DIR', str(tmp_path))
+    monkeypatch.setenv('SPIDER_HISTORY', 'false')
+    monkeypatch.setenv('SPIDER_NEAR_DUP', 'false')
+    monkeypatch.delenv('GITHUB_ACTIONS', raising=False)
+
+    from crawl_state import CrawlState
+    from day_cache import DayCache
+    from spider_core import JnkgBiddingSpider
+
+    spider = JnkgBiddingSpider()
+    spider.incremental = True
+    spider.crawl_state = CrawlState(str(tmp_path / 'crawl_state.json'))
+    spider.day_cache = DayCache(str(tmp_path / 'days'))
+    # 探测窗口内数据少，探测结果为未被截断的 100
+    spider._page_size = 100
+    return spider
+
+
+def state_key(spider):
+    from crawl_state import CrawlState
+    return CrawlState.make_key(spider.default_site_id, spider.default_category_id, 'title', '天安')
+
+
+def test_clamped_first_page_fetches_all_rows(spider):
+    rows = make_rows(95)
+    spider._fetch_page = ClampingServer(rows, cap=20)
+    spider.day_cache = None
+
+    result = spider.search_by_keyword('天安', 'title', days_limit=30)
+
+    assert [row['id'] for row in result] == [row['id'] for row in rows]
+    assert spider._page_size == 20
+    spider.commit_crawl_state()
+    assert spider.crawl_state.get(state_key(spider))['publishDate'] == rows[0]['publishDate']
+
+
+def test_short_result_writes_no_mark_or_day_shard(spider, tmp_path):
+    server = ClampingServer(make_rows(95), cap=20, available=60)
+    spider._fetch_page = server
+
+    result = spider.search_by_keyword('天安', 'title', days_limit=30)
+    spider.commit_crawl_state()
+
+    assert len(result) == 60
+    assert spider.crawl_state.get(state_key(spider)) is None
+    assert not (tmp_path / 'crawl_state.json').exists()
+    assert not (tmp_path / 'days').exists()
+
+
+def test_complete_result_writes_day_shards(spider, tmp_path):
+    spider._fetch_page = ClampingServer(make_rows(95), cap=20)
+
+    assert len(spider.search_by_keyword('天安', 'title', days_limit=30)) == 95
+    assert list((tmp_path / 'days').rglob('*.json'))
+
+
+def test_incremental_crawl_continues_after_clamped_first_page(spider):
+    old = make_rows(1, newest_days_ago=20, prefix='old')
+    spider.crawl_state.advance(state_key(spider), old)
+    spider.crawl_state.commit()
+
+    rows = make_rows(95)
+    spider._fetch_page = ClampingServer(rows + old, cap=20)
+    spider.day_cache = None
+
+    result = spider.search_by_keyword('天安', 'title', days_limit=30)
+
+    assert [row['id'] for row in result] == [row['id'] for row in rows]